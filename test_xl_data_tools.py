@@ -0,0 +1,336 @@
+import datetime
+import email
+import email.policy
+import os
+import random
+import smtplib
+import socketserver
+import threading
+import warnings
+import zipfile
+
+import pytest
+
+import xl_data_tools
+
+
+def make_files(directory):
+    """
+    :param directory: pathlib.Path in which the files are created
+    :return: Dictionary mapping each file name to its contents
+    """
+    contents = {
+        "report.xlsx": os.urandom(50000),                                   # stored
+        "notes.txt": b"quarterly totals\n" * 5000,                         # deflated
+        "empty.csv": b"",
+        "data.csv": b"".join(b"%d,%d\n" % (i, i * i) for i in range(20000)),
+        "bundle.zip": os.urandom(1000),                                     # stored
+    }
+    for name, data in contents.items():
+        (directory / name).write_bytes(data)
+    return contents
+
+
+def test_add_many_round_trip(tmp_path):
+    contents = make_files(tmp_path)
+    names = sorted(contents)
+    path = tmp_path / "out.zip"
+    with xl_data_tools.ZipBuilder(path) as builder:
+        builder.add_many([tmp_path / name for name in names], names,
+                         max_workers=2)
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == names
+        for name in names:
+            assert archive.read(name) == contents[name]
+            expected = (zipfile.ZIP_STORED if name.endswith((".xlsx", ".zip"))
+                        else zipfile.ZIP_DEFLATED)
+            assert archive.getinfo(name).compress_type == expected
+
+
+def test_create_zip_round_trip(tmp_path):
+    contents = make_files(tmp_path)
+    names = sorted(contents)
+    xl_data_tools.create_zip(str(tmp_path), "out.zip", names,
+                             compression=zipfile.ZIP_DEFLATED,
+                             max_workers=3)
+    with zipfile.ZipFile(tmp_path / "out.zip") as archive:
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in names} == contents
+
+
+def test_append_compressed_checks_archive(tmp_path):
+    (tmp_path / "notes.txt").write_bytes(b"abc" * 100)
+    builder = xl_data_tools.ZipBuilder(tmp_path / "out.zip")
+    builder.append_compressed(*builder.deflate(tmp_path / "notes.txt",
+                                               "notes.txt"))
+    with pytest.warns(UserWarning, match="Duplicate name"):
+        builder.append_compressed(*builder.deflate(tmp_path / "notes.txt",
+                                                   "notes.txt"))
+    builder.close()
+    with pytest.raises(ValueError):
+        builder.append_compressed(*builder.deflate(tmp_path / "notes.txt",
+                                                   "other.txt"))
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """
+    Minimal local SMTP server: logs every command, refuses the
+    recipients in self.refuse, hangs up on the next MAIL command if
+    self.drop is set, and keeps each delivered message.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refuse=()):
+        super().__init__(("127.0.0.1", 0), SMTPStubHandler)
+        self.refuse = set(refuse)
+        self.drop = False
+        self.log = list()
+        self.messages = list()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.log.append("CONNECT")
+        self.reply("220 stub")
+        rcpts = list()
+        for line in self.rfile:
+            command = line.decode("ascii").strip()
+            verb = command.split(":")[0].split()[0].lower()
+            server.log.append(verb)
+            if verb in ("ehlo", "helo"):
+                self.reply("250 stub")
+            elif verb == "mail" and server.drop:
+                server.drop = False
+                break
+            elif verb == "mail":
+                rcpts = list()
+                self.reply("250 ok")
+            elif verb == "rcpt":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address in server.refuse:
+                    self.reply("550 no such user")
+                else:
+                    rcpts.append(address)
+                    self.reply("250 ok")
+            elif verb == "data":
+                self.reply("354 go ahead")
+                lines = list()
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                    if data_line.startswith(b"."):                          # undo dot-stuffing
+                        data_line = data_line[1:]
+                    lines.append(data_line)
+                server.messages.append((rcpts, b"".join(lines)))
+                self.reply("250 queued")
+            elif verb == "rset":
+                self.reply("250 ok")
+            elif verb == "quit":
+                self.reply("221 bye")
+                break
+            else:
+                self.reply("502 not implemented")
+
+
+@pytest.fixture
+def mail(tmp_path):
+    """
+    :return: Pair (stub server, message factory)
+    """
+    (tmp_path / "body.html").write_text(".starts with a dot\n<b>Report</b>")
+    servers = list()
+
+    def start(refuse=()):
+        servers.append(SMTPStub(refuse))
+        return servers[-1]
+
+    def message(recipients, bcc=None):
+        return xl_data_tools.build_email(SENDER, recipients, "Report",
+                                         "body.html", str(tmp_path),
+                                         bcc=bcc)
+
+    yield start, message
+    for server in servers:
+        server.close()
+
+
+SENDER = ("me@example.com", None)
+
+
+def test_send_streaming_round_trip(tmp_path, mail):
+    start, message = mail
+    server = start()
+    report = os.urandom(200000)
+    (tmp_path / "report.zip").write_bytes(report)
+    note = b"line one\r\n.line with a dot\r\n"
+    msg = message([("Ann Lee", "ann@example.com")],
+                  bcc=[("Bo", "bo@example.com")])
+    with xl_data_tools.Mailer(SENDER, *server.server_address,
+                              starttls=False) as mailer:
+        refused = mailer.send_streaming(
+            msg, ["report.zip", ("note.txt", note)], str(tmp_path))
+    assert refused == {}
+    assert msg["Bcc"] == "bo@example.com"                                   # the caller's message is untouched
+    (rcpts, data), = server.messages
+    assert rcpts == ["ann@example.com", "bo@example.com"]
+    parsed = email.message_from_bytes(data, policy=email.policy.default)
+    assert parsed["Bcc"] is None
+    assert ".starts with a dot" in parsed.get_body().get_content()
+    attachments = {part.get_filename(): part.get_payload(decode=True)
+                   for part in parsed.iter_attachments()}
+    assert attachments == {"report.zip": report, "note.txt": note}
+
+
+def test_send_streaming_refused_recipient_does_not_reconnect(mail):
+    start, message = mail
+    server = start(refuse={"bad@example.com"})
+    with xl_data_tools.Mailer(SENDER, *server.server_address,
+                              starttls=False) as mailer:
+        refused = mailer.send_streaming(
+            message([("Ann", "ann@example.com"), ("Bad", "bad@example.com")]),
+            ("a.txt", b"abc"))
+        assert list(refused) == ["bad@example.com"]
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            mailer.send_streaming(message([("Bad", "bad@example.com")]),
+                                  ("a.txt", b"abc"))
+    assert server.log.count("CONNECT") == 1
+    assert server.log[-3:] == ["rcpt", "rset", "quit"]
+    assert len(server.messages) == 1
+
+
+def test_send_streaming_reconnects_before_data(mail):
+    start, message = mail
+    server = start()
+    with xl_data_tools.Mailer(SENDER, *server.server_address,
+                              starttls=False) as mailer:
+        mailer.connect()
+        server.drop = True                                                  # connection lost while idle
+        refused = mailer.send_streaming(message([("Ann", "ann@example.com")]),
+                                        ("a.txt", b"abc"))
+    assert refused == {}
+    assert server.log.count("CONNECT") == 2
+    assert len(server.messages) == 1
+
+
+@pytest.mark.parametrize("constant_memory", [False, True])
+def test_export_workbook_filters_header(tmp_path, constant_memory):
+    sheets = {"Data": [["id", "name"], [1, "a"], [2, "b"]],
+              "Header only": [["id", "name"]]}
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")                                      # xlsxwriter warns instead of raising
+        path = xl_data_tools.export_workbook("out", str(tmp_path), sheets,
+                                             constant_memory)
+    with zipfile.ZipFile(path) as archive:
+        tables = [name for name in archive.namelist()
+                  if name.startswith("xl/tables/")]
+        first = archive.read("xl/worksheets/sheet1.xml")
+        second = archive.read("xl/worksheets/sheet2.xml")
+    assert len(tables) == (0 if constant_memory else 1)
+    assert (b'<autoFilter ref="A1:B3"/>' in first) == constant_memory
+    assert b'<autoFilter ref="A1:B1"/>' in second
+
+
+def test_csv_rows_pads_short_rows(tmp_path):
+    (tmp_path / "short.csv").write_text("id,name,when\n1\n2,bo,01/02/2020\n")
+    types = {"id": "int", "name": "str", "when": "date"}
+    assert list(xl_data_tools.csv_rows("short.csv", str(tmp_path),
+                                       types=types)) == [
+        ["id", "name", "when"],
+        [1, None, None],
+        [2, "bo", datetime.datetime(2020, 1, 2)]]
+
+
+def test_extract_workbook_closes_on_failure(tmp_path, monkeypatch):
+    path = xl_data_tools.export_workbook(
+        "out", str(tmp_path), {"Data": [["id"], [1], [2]]})
+    assert xl_data_tools.extract_workbook(path)[0][1].data == \
+        [["id"], [1.0], [2.0]]
+
+    closed = list()
+    close = xl_data_tools.XlFileExtract.close
+
+    def record_close(self):
+        closed.append(self.zip)
+        close(self)
+
+    def fail(self, *args):
+        raise RuntimeError("unreadable sheet")
+
+    monkeypatch.setattr(xl_data_tools.XlFileExtract, "close", record_close)
+    monkeypatch.setattr(xl_data_tools.XlFileExtract, "read_sheet", fail)
+    with pytest.raises(RuntimeError):
+        xl_data_tools.extract_workbook(path)
+    assert closed and closed[0].fp is None
+
+
+def test_directory_index_concurrent_refresh(tmp_path):
+    for number in range(50):
+        path = tmp_path / f"report {number}.csv"
+        path.write_text("x")
+        os.utime(path, (number, number))
+    index = xl_data_tools.DirectoryIndex(str(tmp_path))
+    assert index.lookup(["report"])[-1] == "report 49.csv"
+
+    errors = list()
+
+    def look():
+        try:
+            for _ in range(200):
+                index.lookup(["report"])
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=look) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for number in range(50, 100):                                           # rebuild the index under the readers
+        (tmp_path / f"report {number}.csv").write_text("x")
+        (tmp_path / f"report {number - 50}.csv").unlink()
+        index.refresh(force=True)
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(index.lookup(["report"])) == 50
+
+
+def test_csv_to_xlsx_skips_empty_files(tmp_path):
+    source = tmp_path / "csv"
+    source.mkdir()
+    (source / "a.csv").write_text("id,amount\n1,2.5\n")
+    (source / "b.csv").write_text("")
+    (source / "c.csv").write_text("id,amount\n")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        path = xl_data_tools.csv_to_xlsx(str(source), "out", str(tmp_path),
+                                         types={"amount": "float"})
+    with zipfile.ZipFile(path) as archive:
+        workbook = archive.read("xl/workbook.xml")
+        assert archive.read("xl/worksheets/sheet2.xml").count(b"<row ") == 1
+    assert b'name="a"' in workbook and b'name="c"' in workbook
+    assert b'name="b"' not in workbook
+
+
+def test_date_columns_round_trip_exactly():
+    rng = random.Random(0)
+    start = datetime.datetime(1900, 1, 1)
+    dates = [start + datetime.timedelta(microseconds=rng.randrange(
+        200 * 365 * 86400 * 10 ** 6)) for _ in range(20000)]
+    data = [["when", "n"]] + [[date, n] for n, date in enumerate(dates)]
+    columns = xl_data_tools.XlArray(data, 1, "A").to_columns()
+    assert isinstance(columns.columns[0], xl_data_tools.DateColumn)
+    assert columns.to_array().data == data
+    filtered = columns.filter(0, dates[7])
+    assert filtered.to_array().data == [data[0], data[8]]
+    assert filtered.columns[0].typecode == "q"
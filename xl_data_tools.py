@@ -1,15 +1,41 @@
 import os
+import argparse
+import array
+import base64
+import io
+import collections
+import copy
+import concurrent.futures
 import csv
 import itertools
+import mimetypes
 import datetime
+import email.message
+import email.policy
+import email.utils
+import functools
+import re
 import string
 import subprocess
+import threading
+import time
+import uuid
 from email.message import EmailMessage
 import smtplib
 import ssl
+import queue
 import zipfile
-import xlwings as xw
+import zlib
+from xml.etree import ElementTree
 import xlsxwriter
+try:
+    import xlwings as xw
+except ImportError:     # XlFileExtract and XlCreate work without Excel
+    xw = None
+try:
+    import pythoncom    # Windows only: per-thread COM initialization
+except ImportError:
+    pythoncom = None
 
 """
 This module provides convenient objects for pulling,
@@ -18,6 +44,8 @@ It includes functions for common tasks needed to
 locate and timestamp Excel file names.
 """
 
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)      # Excel serial date 0
+
 
 def remove_files(path, exclude=None):
     """
@@ -39,68 +67,257 @@ def mod_date(foo):
     :return: file modification date
     Requires Python version 3.6+ to accept path-like objects.
     """
-    print(foo)
-    if foo == os.path.split(foo)[1]:
-        t = os.path.getmtime(foo)
-        date = datetime.datetime.fromtimestamp(t)
-    else:
-        date = mod_date(os.path.split(foo)[1])
-    return date
+    t = os.path.getmtime(foo)
+    return datetime.datetime.fromtimestamp(t)
+
+
+def scan_dir(path, recursive=False):
+    """
+    Lists one directory with os.scandir, using each entry's cached
+    stat result (one stat per file at most).
+    :param path: Directory to be scanned
+    :param recursive: If True, also collect the subdirectories
+    :return: Pair (files, subdirs) where files lists pairs
+    (file path, modification time) and subdirs lists directory paths
+    """
+    files, subdirs = list(), list()
+    with os.scandir(path) as iter_dir:
+        for entry in iter_dir:
+            if entry.is_file():
+                files.append((entry.path, entry.stat().st_mtime))
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+    return files, subdirs
+
+
+def scan_files(dir_path, recursive=False, max_workers=None):
+    """
+    Collects the modification time of every file in a directory
+    without changing the working directory. Subdirectories (if
+    recursive) are scanned in parallel threads, which hides the
+    per-request latency of network shares.
+    :param dir_path: Directory to be scanned
+    :param recursive: If True, include files in all subdirectories
+    :param max_workers: Number of scanning threads
+    :return: Dictionary mapping file paths to modification times
+    """
+    if not recursive:
+        return dict(scan_dir(dir_path)[0])
+    mtimes = dict()
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        pending = {executor.submit(scan_dir, dir_path, True)}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                mtimes.update(files)
+                pending.update(executor.submit(scan_dir, subdir, True)
+                               for subdir in subdirs)
+    return mtimes
+
+
+def file_tokens(name):
+    """
+    :param name: File name (e.g., "Sales Report 5.26.18.xlsx")
+    :return: Keywords of the file name once its dots are removed
+    (e.g., ["Sales", "Report", "52618xlsx"])
+    """
+    return name.replace(".", "").split()
+
+
+class DirectoryIndex:
+    """
+    Cached index of the files in one directory: each file's
+    modification time and an inverted index from filename tokens
+    (see file_tokens) to filenames. The index is rebuilt only when
+    the directory's own modification time changes (i.e., when files
+    are added, removed, or renamed); use refresh(force=True) after
+    files are modified in place.
+    """
+    instances = dict()                                                      # Shared indexes by directory
+    instances_lock = threading.Lock()
+
+    def __init__(self, dir_path):
+        self.path = dir_path
+        self.stamp = None
+        self.index = (dict(), dict())                                       # (filename -> modification time,
+                                                                            #  token -> set of filenames)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get(cls, dir_path):
+        """
+        :param dir_path: Directory to be indexed
+        :return: The shared DirectoryIndex of the directory
+        """
+        dir_path = os.path.abspath(dir_path)
+        with cls.instances_lock:
+            if dir_path not in cls.instances:
+                cls.instances[dir_path] = cls(dir_path)
+            return cls.instances[dir_path]
+
+    def refresh(self, force=False):
+        """
+        Rescans the directory if it changed since the last scan.
+        :param force: If True, rescan regardless
+        """
+        with self.lock:
+            stamp = os.stat(self.path).st_mtime_ns
+            if stamp == self.stamp and not force:
+                return
+            mtimes, tokens = dict(), dict()
+            for path, mtime in scan_dir(self.path)[0]:
+                name = os.path.basename(path)
+                mtimes[name] = mtime
+                for token in file_tokens(name):
+                    tokens.setdefault(token, set()).add(name)
+            self.index = (mtimes, tokens)                                   # swapped as one snapshot for lookup()
+            self.stamp = stamp
+        return
+
+    def lookup(self, keywords):
+        """
+        :param keywords: Sequence of keywords that must all be
+        tokens of the filename
+        :return: Matching filenames from oldest to newest
+        """
+        self.refresh()
+        mtimes, tokens = self.index
+        if not keywords:
+            matches = set(mtimes)
+        else:
+            matches = set.intersection(*(tokens.get(keyword, set())
+                                         for keyword in keywords))
+        return sorted(matches, key=mtimes.__getitem__)
 
 
-def find_file(dir_path, keywords):
+def find_file(dir_path, keywords, recursive=False, max_workers=None):
     """
-    Searches for the newest version of a given file.
+    Searches for the newest version of a given file. Never changes
+    the working directory, so it is safe to call from several threads.
     :param dir_path: directory containing the desired file
     :param keywords: string of keywords from the keywords of the desired file
-    :return: path of the desired file
+    :param recursive: If True, also search all subdirectories
+    (scanned in parallel; see scan_files) instead of using the
+    cached DirectoryIndex
+    :param max_workers: Number of scanning threads if recursive
+    :return: path of the desired file (None if there is no match)
     """
-    dir_list = os.listdir(dir_path)
     if isinstance(keywords, str):
         keywords = keywords.split()
-    matches = list()
-    initial_dir = os.getcwd()
-    os.chdir(dir_path)
-    for item in dir_list:
-        while "." in item:
-            loc = item.find(".")
-            if loc == len(item) - 1:
-                item = item[:-1]
-            else:
-                item = item[:loc] + item[loc + 1:]
-        if os.path.isfile(os.path.join(dir_path, item)):
-            item_list = item.split()
-            if all(component in item_list for component in keywords):
-                matches.append(item)
-    if not matches:
-        print(f"There is no file containing keywords '{keywords}' in"
-               f"{dir_path}.")
+    if recursive:
+        mtimes = scan_files(dir_path, True, max_workers)
+        matches = sorted((path for path in mtimes if all(
+            keyword in file_tokens(os.path.basename(path))
+            for keyword in keywords)), key=mtimes.__getitem__)
     else:
-        matches.sort(key=mod_date)
-    os.chdir(initial_dir)
+        matches = [os.path.join(dir_path, name) for name in
+                   DirectoryIndex.get(dir_path).lookup(keywords)]
+    if not matches:
+        print(f"There is no file containing keywords '{keywords}' in "
+              f"{dir_path}.")
+        return None
 
-    return os.path.join(dir_path, matches[-1])
+    return matches[-1]
 
 
 def empty_check(lst):
     """
     Determines whether the nested n-layer list contains only empty
-    and/or None-type items.
+    and/or None-type items. The nesting is walked iteratively and the
+    walk stops at the first non-empty item.
     :param lst: any list, integer, float, or string
     :return: True if the nested list is (a) a list and (b) contains
     only empty lists, type objects, or None; otherwise, False
     """
-    try:
-        if not lst:
-            return True
-        if (isinstance(lst, str) or isinstance(lst, int) or
-                isinstance(lst, float)):
+    stack = [lst]
+    while stack:
+        item = stack.pop()
+        if not item:
+            continue
+        if isinstance(item, (str, int, float)):
             return False
-        else:
-            return all(map(empty_check, lst))
-    except TypeError:
-        # This indicates that lst contains None as an object
-        return True
+        try:
+            stack.extend(item)
+        except TypeError:
+            # This indicates that item is None or another non-iterable
+            continue
+    return True
+
+
+def empty_mask(block):
+    """
+    Evaluates emptiness for every cell of a 2-D block in a single
+    pass. A cell is empty only if it is None, an empty string, or a
+    nested list that empty_check finds empty; any other value
+    (including dates and zero) is content. (empty_check itself keeps
+    its original semantics for existing callers.)
+    :param block: List of rows (lists), as returned by xlwings
+    :return: Pair (row_mask, col_mask) of lists of booleans where
+    row_mask[i] is True if row i is empty and col_mask[j] is True if
+    column j is empty in every row
+    """
+    row_mask = list()
+    width = max(map(len, block), default=0)
+    col_mask = [True] * width
+    for row in block:
+        row_empty = True
+        for col_py, cell in enumerate(row):
+            if cell is None or cell == "":
+                continue
+            if not isinstance(cell, (list, tuple)) or \
+                    not empty_check(cell):
+                row_empty = False
+                col_mask[col_py] = False
+        row_mask.append(row_empty)
+    return row_mask, col_mask
+
+
+def used_range(block, masks=None):
+    """
+    Locates the last non-empty row and column of a 2-D block by
+    scanning its emptiness masks (see empty_mask) in reverse.
+    :param block: List of rows (lists)
+    :param masks: Optional pair (row_mask, col_mask) already
+    computed for the block
+    :return: Pair (last_row, last_col) as 1-based counts; (0, 0) if
+    the block is empty
+    """
+    row_mask, col_mask = masks or empty_mask(block)
+    last_row = len(row_mask)
+    while last_row and row_mask[last_row - 1]:
+        last_row -= 1
+    last_col = len(col_mask)
+    while last_col and col_mask[last_col - 1]:
+        last_col -= 1
+    return last_row, last_col
+
+
+def block_to_array(block, sht_name=None, exclude_cols=None, row=1,
+                   width=None):
+    """
+    Trims a 2-D block read from a sheet to its used range (padding
+    short rows with None), removes its empty rows, and applies any
+    column exclusions.
+    :param block: List of rows (lists) starting in column A
+    :param sht_name: Name of the sheet the block was read from
+    :param exclude_cols: List of pairs (a,b) where a is the sheet
+    name and b lists the columns to be excluded
+    :param row: Excel row of block[0]
+    :param width: If given, every row is trimmed or padded to this
+    many columns instead of the block's own last used column
+    :return: XlArray of the trimmed data
+    """
+    row_mask, col_mask = masks = empty_mask(block)
+    last_col = used_range(block, masks)[1] if width is None else width
+    data = [record[:last_col] + [None] * (last_col - len(record))
+            for record, is_empty in zip(block, row_mask) if not is_empty]
+    sht_array = XlArray(data, row, "A")
+    for x_sheet, x_columns in exclude_cols or ():
+        if x_sheet == sht_name:
+            sht_array.remove(x_columns)
+    return sht_array
 
 
 def terminate_excel():
@@ -123,6 +340,8 @@ def hide_excel(boolean):
     Excel processes are exited.
     :param boolean: True or False boolean constant
     """
+    if xw is None:                                                          # no Excel automation available
+        return
     for app in xw.apps:
         app.display_alerts = not boolean
         app.screen_updating = not boolean
@@ -131,30 +350,285 @@ def hide_excel(boolean):
     return
 
 
-def csv_extract(file, directory, header=None):
+def csv_parser(kind, date_format="%m/%d/%Y"):
+    """
+    Resolves a column type declaration into a parsing function.
+    Empty strings (and missing fields) parse to None; values that
+    fail to parse are kept as strings.
+    :param kind: "str", "int", "float", "number" (int if possible,
+    otherwise float), "date", or any callable taking a string
+    :param date_format: strptime format used for "date" columns
+    :return: Function converting a CSV string into a typed value
+    """
+    if callable(kind):
+        parse = kind
+    elif kind == "str":
+        parse = str
+    elif kind == "int":
+        parse = int
+    elif kind == "float":
+        parse = float
+    elif kind == "number":
+        def parse(value):
+            try:
+                return int(value)
+            except ValueError:
+                return float(value)
+    elif kind == "date":
+        def parse(value):
+            return datetime.datetime.strptime(value, date_format)
+    else:
+        raise ValueError(f"Unknown column type '{kind}'")
+
+    def parse_cell(value):
+        if value is None or value == "":
+            return None
+        try:
+            return parse(value)
+        except ValueError:
+            return value
+    return parse_cell
+
+
+def pad_record(record, width):
+    """
+    :param record: Row read from a CSV file
+    :param width: Number of fields the row should have
+    :return: The row, padded with None if it is too short (as
+    csv.DictReader's restval would)
+    """
+    if len(record) < width:
+        record.extend([None] * (width - len(record)))
+    return record
+
+
+def csv_rows(file, directory, header=None, types=None,
+             date_format="%m/%d/%Y", chunk_size=None):
+    """
+    Streams a CSV file row by row (header first) without reading
+    the whole file, so the output can be fed straight to
+    XlCreate.write_stream.
+    :param file: Name of the CSV file
+    :param directory: Name of the directory containing the CSV file
+    :param header: Sequence containing all columns from the CSV to be
+    included in the output. If None, the CSV's first line will be used.
+    :param types: Dictionary mapping column names to declared types
+    (see csv_parser); undeclared columns are kept as strings
+    :param date_format: strptime format used for "date" columns.
+    Missing trailing fields of short rows are read as None.
+    :param chunk_size: If given, rows are yielded in lists of up to
+    chunk_size rows (the header being the first row of the first
+    list) rather than one at a time
+    :return: Generator of rows (lists) or of lists of rows
+    """
+    with open(os.path.join(directory, file), newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        file_header = next(reader, [])
+        columns = list(header) if header else file_header
+        positions = [file_header.index(column) for column in columns]
+        types = types or dict()
+        parsers = [csv_parser(types[column], date_format)
+                   if column in types else None for column in columns]    # Resolved once per column
+        typed = list(zip(positions, parsers))
+        width = max(positions, default=-1) + 1
+        rows = itertools.chain([columns], (
+            [record[position] if parse is None else parse(record[position])
+             for position, parse in typed]
+            for record in (pad_record(record, width) for record in reader
+                           if record)))
+        if chunk_size is None:
+            yield from rows
+        else:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                yield chunk
+
+
+def csv_extract(file, directory, header=None, types=None):
     """
-    Converts a given CSV file into a pandas dataframe.
+    Converts a given CSV file into a dictionary keyed by its first
+    column (rows with an empty first column are skipped).
     :param file: Name of the CSV file
     :param directory: Name of the directory containing the CSV file
     :param header: Sequence containing all columns from the CSV to be
     included in the output. If None, the CSV's first line will be used.
-    :return: pandas dataframe
-    """
-    initial_dir = os.getcwd()
-    os.chdir(directory)
-    with open(file, newline='') as csvfile:
-        reader = csv.DictReader(csvfile, fieldnames=header)
-        for row in reader:
-            new_key = row[header[0]]
-            if new_key is not None and new_key != "":
-                csv_dict[new_key] = list()
-                for column in header[1:]:
-                    csv_dict[new_key].append(row[header[column]])
-    os.chdir(initial_dir)
+    :param types: Dictionary mapping column names to declared types
+    (see csv_parser)
+    :return: Dictionary mapping each first-column value to the list
+    of the row's remaining values
+    """
+    csv_dict = dict()
+    rows = csv_rows(file, directory, header, types)
+    next(rows, None)                                                        # skip the header
+    for row in rows:
+        new_key = row[0]
+        if new_key is not None and new_key != "":
+            csv_dict[new_key] = row[1:]
     return csv_dict
 
 
-def create_zip(directory, zip_name, files):
+class ZipBuilder:
+    """
+    Builds a zip archive with the archive opened only once. Files are
+    streamed into it in chunks, already-compressed file types can be
+    stored rather than recompressed, and deflated members can be
+    compressed in parallel threads (zlib releases the GIL) before
+    being appended to the archive in order. Consider instantiating
+    within a "with" statement (otherwise, use ZipBuilder.close()).
+    """
+
+    def __init__(self, path, compression=zipfile.ZIP_DEFLATED,
+                 compresslevel=None,
+                 store_suffixes=(".xlsx", ".xlsm", ".zip"),
+                 chunk_size=1 << 20):
+        """
+        :param path: Path of the new zip file
+        :param compression: zipfile compression method (e.g.,
+        zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED)
+        :param compresslevel: Compression level (None for the
+        method's default)
+        :param store_suffixes: File extensions that are stored
+        without compression (e.g., already-compressed .xlsx files)
+        :param chunk_size: Number of bytes read from each file at once
+        when compressing in parallel
+        """
+        self.path = path
+        self.compression = compression
+        self.compresslevel = compresslevel
+        self.store_suffixes = tuple(suffix.lower() for suffix in
+                                    store_suffixes or ())
+        self.chunk_size = chunk_size
+        self.zip = zipfile.ZipFile(path, "w", compression,
+                                   compresslevel=compresslevel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def close(self):
+        self.zip.close()
+        return
+
+    def method(self, arcname):
+        """
+        :param arcname: Name of the member in the archive
+        :return: Compression method to be used for the member
+        """
+        if arcname.lower().endswith(self.store_suffixes):
+            return zipfile.ZIP_STORED
+        return self.compression
+
+    def add(self, path, arcname=None):
+        """
+        Streams one file into the archive.
+        :param path: Path of the file to be added
+        :param arcname: Name of the member in the archive (defaults
+        to the file name)
+        """
+        arcname = arcname or os.path.basename(path)
+        self.zip.write(path, arcname, self.method(arcname),
+                       self.compresslevel)                                  # ZipFile.write copies in chunks
+        return
+
+    def add_bytes(self, arcname, data):
+        """
+        Adds an in-memory file (e.g., a workbook's bytes) to the archive.
+        :param arcname: Name of the member in the archive
+        :param data: Contents of the member
+        """
+        self.zip.writestr(arcname, data, self.method(arcname),
+                          self.compresslevel)
+        return
+
+    def deflate(self, path, arcname):
+        """
+        Compresses one file in memory (run in worker threads).
+        :param path: Path of the file to be compressed
+        :param arcname: Name of the member in the archive
+        :return: Pair (zinfo, compressed bytes)
+        """
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        level = (zlib.Z_DEFAULT_COMPRESSION if self.compresslevel is None
+                 else self.compresslevel)
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        crc, file_size, chunks = 0, 0, list()
+        with open(path, "rb") as src:
+            for chunk in iter(lambda: src.read(self.chunk_size), b""):
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                chunks.append(compressor.compress(chunk))
+        chunks.append(compressor.flush())
+        data = b"".join(chunks)
+        zinfo.CRC, zinfo.file_size, zinfo.compress_size = \
+            crc, file_size, len(data)
+        return zinfo, data
+
+    def append_compressed(self, zinfo, data):
+        """
+        Appends a member whose data has already been compressed.
+        zipfile has no public API for raw members, so the local
+        header and data are written at the end of the archive and the
+        member is registered just as ZipFile.write would (including
+        its checks for a closed archive, duplicate names, and ZIP64
+        limits).
+        :param zinfo: ZipInfo with CRC and sizes filled in
+        :param data: Compressed member data
+        """
+        archive = self.zip
+        with archive._lock:
+            archive._writecheck(zinfo)
+            archive._didModify = True
+            archive.fp.seek(archive.start_dir)
+            zinfo.header_offset = archive.start_dir
+            archive.fp.write(zinfo.FileHeader())
+            archive.fp.write(data)
+            archive.start_dir = archive.fp.tell()
+            archive.filelist.append(zinfo)
+            archive.NameToInfo[zinfo.filename] = zinfo
+        return
+
+    def add_many(self, paths, arcnames=None, max_workers=None):
+        """
+        Adds many files in order, compressing deflated members in
+        parallel threads. At most two members per thread are held
+        (compressed) in memory at once.
+        :param paths: Sequence of paths of the files to be added
+        :param arcnames: Sequence of member names (defaults to the
+        file names)
+        :param max_workers: Number of compression threads (defaults
+        to the number of CPUs)
+        """
+        arcnames = arcnames or [os.path.basename(path) for path in paths]
+        max_workers = max_workers or os.cpu_count() or 1
+        members = iter(zip(paths, arcnames))
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            while True:
+                for path, arcname in itertools.islice(
+                        members, 2 * max_workers - len(pending)):
+                    if self.method(arcname) == zipfile.ZIP_DEFLATED:
+                        pending.append(executor.submit(self.deflate, path,
+                                                       arcname))
+                    else:
+                        pending.append((path, arcname))
+                if not pending:
+                    break
+                member = pending.popleft()                                  # preserve the member order
+                if isinstance(member, tuple):
+                    self.add(*member)
+                else:
+                    self.append_compressed(*member.result())
+        return
+
+
+def create_zip(directory, zip_name, files, compression=zipfile.ZIP_STORED,
+               compresslevel=None, max_workers=None):
     """
     Removes all existing .zip files in the chosen directory with the given
     zip_name and creates a new .zip file with
@@ -162,43 +636,87 @@ def create_zip(directory, zip_name, files):
     :param directory: The directory where the zip file will be created
     :param zip_name: The name of the new zip file
     :param files: List of the files to be zipped (as filenames)
+    :param compression: zipfile compression method (.xlsx, .xlsm, and
+    .zip files are always stored as they are already compressed)
+    :param compresslevel: Compression level (None for the default)
+    :param max_workers: If given, deflated files are compressed in
+    this many parallel threads
     """
     # Compile zip archive for reports if not comprised of a singled file
-    initial_dir = os.getcwd()
-    os.chdir(directory)
     if len(files) > 1:
-        with os.scandir(os.getcwd()) as scan:
+        with os.scandir(directory) as scan:
             for entry in scan:
-                if zip_name in str(entry):
-                    os.remove(entry)
-        for foo in files:
-            with zipfile.ZipFile(zip_name, "a") as my_zip:
-                my_zip.write(foo)
-    os.chdir(initial_dir)
+                if zip_name in entry.name:
+                    os.remove(entry.path)
+        paths = [os.path.join(directory, foo) for foo in files]
+        with ZipBuilder(os.path.join(directory, zip_name), compression,
+                        compresslevel) as my_zip:
+            if max_workers:
+                my_zip.add_many(paths, files, max_workers)
+            else:
+                for path, foo in zip(paths, files):
+                    my_zip.add(path, foo)
 
 
-def send_email(sender, recipients, subject, html, html_dir, cc=None,
-               bcc=None, attachments=None, attachments_dir=None):
+def attachment_list(attachments, attachments_dir=None):
     """
-    Sends out an SMTP email using SSL, HTML content, and up to one
-    attachment (including .zip). Recipients' names must have the form
-    "required_first_name optional_middle_name optional_last_name". The
-    sender's email is assumed to be Gmail/Google Inbox.
-    :param sender: Sequence (a, b) where a is the sender's email and
-    b is their email account password
-    :param recipients: Sequence of pairs (a, b) where a is the
-    recipient's name and b is their email
-    :param cc: Sequence of pairs (a, b) where a is the cc
-    recipient's name and b is their email
-    :param bcc: Sequence of pairs (a, b) where a is the bcc
-    recipient's name and b is their email
-    :param subject: Subject title for the email
-    :param attachments: File name of the attachment (including
-    .zip) - no more than 1 per email
-    :param html: File name of the html script defining the email
-    body's content and signature
+    :param attachments: File name of an attachment, a pair (file
+    name, bytes) for an attachment held in memory, or a list of these
     :param attachments_dir: Directory containing the attachments
-    :param html_dir: Directory containing the html script
+    :return: List of pairs (file name, path or bytes)
+    """
+    if attachments is None:
+        return list()
+    if isinstance(attachments, (str, tuple)):
+        attachments = [attachments]
+    return [item if isinstance(item, tuple) else
+            (item, os.path.join(attachments_dir or "", item))
+            for item in attachments]
+
+
+def attachment_type(name):
+    """
+    :param name: File name of an attachment
+    :return: Pair (maintype, subtype) of its MIME type
+    """
+    mime_type, encoding = mimetypes.guess_type(name)
+    if mime_type is None or encoding is not None:
+        mime_type = "application/octet-stream"
+    return tuple(mime_type.split("/", 1))
+
+
+def base64_chunks(source, lines=1024):
+    """
+    Encodes an attachment as base64 (76-character CRLF-terminated
+    lines) one chunk at a time.
+    :param source: Path of the file or bytes to be encoded
+    :param lines: Number of encoded lines per chunk
+    :return: Generator of encoded chunks
+    """
+    chunk_size = 57 * lines                                                 # 57 bytes encode to one full line
+    if isinstance(source, bytes):
+        for start in range(0, len(source), chunk_size):
+            yield base64.encodebytes(
+                source[start:start + chunk_size]).replace(b"\n", b"\r\n")
+        return
+    with open(source, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+
+def dot_stuff(data):
+    """
+    :param data: CRLF-terminated lines to be sent after SMTP DATA
+    :return: The lines with any leading "." doubled (RFC 5321)
+    """
+    return re.sub(rb"(?m)^\.", b"..", data)
+
+
+def build_email(sender, recipients, subject, html, html_dir, cc=None,
+                bcc=None, attachments=None, attachments_dir=None):
+    """
+    Constructs the HTML email sent by send_email (same parameters).
+    :return: EmailMessage ready to be sent (e.g., by Mailer.send)
     """
 
     # Construct formatted strings of names/emails for Message module
@@ -211,27 +729,24 @@ def send_email(sender, recipients, subject, html, html_dir, cc=None,
                       'bcc': bcc_emails}
 
     for group, contact_list in contact_lists.items():
-        for contact in contact_list:
+        for contact in contact_list or ():
             contact_names[group].append(contact[0].split()[0])
             contact_emails[group].append(contact[1])
-            contact_names[group] = ", ".join(contact_names[group])
-            contact_emails[group] = "; ".join(contact_emails[group])
+        contact_names[group] = ", ".join(contact_names[group])
+        contact_emails[group] = ", ".join(contact_emails[group])
 
     # Extract HTML content for email body
-    initial_dir = os.getcwd()
-    os.chdir(html_dir)
-    with open(html) as f:
+    with open(os.path.join(html_dir, html)) as f:
         email_body = f.read()
-    os.chdir(initial_dir)
 
     # Construct email
     msg = EmailMessage()
     msg['Subject'] = subject
     msg['From'] = sender[0]
     msg['To'] = contact_emails['recipients']
-    if not cc:
+    if cc:
         msg['Cc'] = contact_emails['cc']
-    if not bcc:
+    if bcc:
         msg['Bcc'] = contact_emails['bcc']
     msg.set_content("""\
         <html>
@@ -243,57 +758,645 @@ def send_email(sender, recipients, subject, html, html_dir, cc=None,
             </p>
           </body>
         </html>
-        """.format(contact_names[recipients], email_body),
+        """.format(contact_names['recipients'], email_body),
                     subtype='html')
-    if attachments is not None and attachments_dir is not None:
-        # Prepare the attachment(s) for delivery
-        initial_dir = os.getcwd()
-        os.chdir(attachments_dir)
-        if attachments[len(attachments) - 4:] == ".zip":
-            with open(attachments, 'rb') as myzip:
-                msg.add_attachment(myzip.read(), maintype="multipart",
-                                   subtype="mixed", filename=attachments)
+    # Prepare the attachment(s) for delivery
+    for name, source in attachment_list(attachments, attachments_dir):
+        maintype, subtype = attachment_type(name)
+        if isinstance(source, bytes):
+            data = source
         else:
-            with open(attachments, 'rb') as fp:
-                msg.add_attachment(fp.read(), maintype="multipart",
-                                   subtype="mixed", filename=attachments)
-        os.chdir(initial_dir)
+            with open(source, 'rb') as fp:
+                data = fp.read()
+        msg.add_attachment(data, maintype=maintype, subtype=subtype,
+                           filename=name)
+
+    return msg
+
+
+class Mailer:
+    """
+    Keeps one authenticated SMTP connection open across many
+    messages, reconnecting automatically if the server drops it.
+    Consider instantiating within a "with" statement (otherwise, use
+    Mailer.close()).
+    """
+
+    def __init__(self, sender, host='smtp.gmail.com', port=587,
+                 starttls=True, timeout=60):
+        """
+        :param sender: Sequence (a, b) where a is the sender's email and
+        b is their email account password (None to skip logging in,
+        e.g., for a local test server)
+        :param host: SMTP server host
+        :param port: SMTP server port
+        :param starttls: If True, upgrade the connection with STARTTLS
+        :param timeout: Socket timeout in seconds
+        """
+        self.sender = sender
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.timeout = timeout
+        self.smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def connect(self):
+        """
+        Opens (or reopens) the SMTP connection and logs in.
+        """
+        self.close()
+        smtp = smtplib.SMTP(host=self.host, port=self.port,
+                            timeout=self.timeout)
+        try:
+            if self.starttls:
+                context = ssl.create_default_context()
+                smtp.starttls(context=context)
+            if self.sender[1] is not None:
+                smtp.login(self.sender[0], self.sender[1])
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        return
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+            self.smtp = None
+        return
+
+    def send(self, msg):
+        """
+        Sends one message over the open connection, connecting first
+        if needed and reconnecting once if the connection was lost.
+        :param msg: EmailMessage (e.g., from build_email)
+        :return: Dictionary of refused recipients (empty if every
+        recipient was accepted)
+        """
+        if self.smtp is None:
+            self.connect()
+        try:
+            return self.smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            pass
+        except smtplib.SMTPException:                                       # e.g., refused recipients
+            raise
+        except OSError:                                                     # socket-level failure
+            pass
+        self.connect()
+        return self.smtp.send_message(msg)
+
+    def send_streaming(self, msg, attachments, attachments_dir=None):
+        """
+        Sends a message with attachments that are read, base64-encoded,
+        and sent in chunks, so memory use does not depend on the size
+        of the attachments (e.g., large zipped report bundles). If the
+        connection was lost before the message data is sent, it is
+        reopened and the envelope retried once. msg is not modified.
+        :param msg: EmailMessage without attachments (e.g., from
+        build_email)
+        :param attachments: Attachment or list of attachments as
+        accepted by attachment_list
+        :param attachments_dir: Directory containing the attachments
+        :return: Dictionary of refused recipients
+        """
+        if self.smtp is None:
+            self.connect()
+        recipients = [address for _, address in email.utils.getaddresses(
+            msg.get_all('To', []) + msg.get_all('Cc', []) +
+            msg.get_all('Bcc', []))]
+        msg = copy.deepcopy(msg)                                            # keep the caller's message reusable
+        del msg['Bcc']
+
+        # Serialize everything but the attachments, leaving the
+        # multipart open so the attachment parts can follow
+        msg.make_mixed()
+        boundary = "=" * 15 + uuid.uuid4().hex
+        msg.set_boundary(boundary)
+        delimiter = b"--" + boundary.encode("ascii")
+        head = msg.as_bytes(policy=email.policy.SMTP)
+        head = head[:head.rindex(delimiter + b"--")]
+
+        try:
+            try:
+                refused = self.envelope(msg['From'] or self.sender[0],
+                                        recipients)
+            except smtplib.SMTPServerDisconnected:                          # nothing sent yet: safe to retry
+                refused = None
+            except smtplib.SMTPException:                                   # e.g., refused sender/recipients
+                raise
+            except OSError:                                                 # socket-level failure
+                refused = None
+            if refused is None:
+                self.connect()
+                refused = self.envelope(msg['From'] or self.sender[0],
+                                        recipients)
+            code, response = self.smtp.docmd("data")
+            if code != 354:
+                raise smtplib.SMTPDataError(code, response)
+            self.smtp.send(dot_stuff(head))
+            for name, source in attachment_list(attachments,
+                                                attachments_dir):
+                maintype, subtype = attachment_type(name)
+                part = email.message.MIMEPart(policy=email.policy.SMTP)
+                part['Content-Type'] = f"{maintype}/{subtype}"
+                part['Content-Transfer-Encoding'] = "base64"
+                part.add_header('Content-Disposition', 'attachment',
+                                filename=name)
+                self.smtp.send(delimiter + b"\r\n" +
+                               dot_stuff(part.as_bytes()))
+                for chunk in base64_chunks(source):
+                    self.smtp.send(chunk)
+            self.smtp.send(delimiter + b"--\r\n.\r\n")
+            code, response = self.smtp.getreply()
+            if code != 250:
+                raise smtplib.SMTPDataError(code, response)
+        except smtplib.SMTPRecipientsRefused:
+            self.smtp.rset()
+            raise
+        except (smtplib.SMTPException, OSError):
+            self.close()                                                    # the transaction state is unknown
+            raise
+        return refused
+
+    def envelope(self, from_addr, recipients):
+        """
+        Starts a mail transaction (the steps before DATA).
+        :param from_addr: Envelope sender
+        :param recipients: List of recipient emails
+        :return: Dictionary of refused recipients
+        """
+        self.smtp.ehlo_or_helo_if_needed()
+        self.smtp.mail(from_addr)
+        refused = dict()
+        for recipient in recipients:
+            code, response = self.smtp.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if len(refused) == len(recipients):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        return refused
+
+    def send_many(self, messages):
+        """
+        Sends many messages over the same connection. A failure of
+        one message does not stop the others.
+        :param messages: Iterable of EmailMessage objects
+        :return: List with, for each message, its dictionary of
+        refused recipients or the exception raised
+        """
+        results = list()
+        for msg in messages:
+            try:
+                results.append(self.send(msg))
+            except (smtplib.SMTPException, OSError) as error:
+                if isinstance(error, smtplib.SMTPServerDisconnected):
+                    self.close()
+                results.append(error)
+        return results
+
+
+class MailQueue:
+    """
+    Background dispatch queue for report emails. Messages are sent by
+    worker threads, each keeping its own Mailer connection, so the
+    caller can keep generating reports while mail goes out. Failed
+    sends are retried with exponential backoff. Consider
+    instantiating within a "with" statement (otherwise, use
+    MailQueue.close()).
+    """
+
+    def __init__(self, sender, host='smtp.gmail.com', port=587,
+                 starttls=True, connections=2, max_queued=100, retries=3,
+                 backoff=1.0):
+        """
+        :param sender: Sequence (a, b) where a is the sender's email and
+        b is their email account password (see Mailer)
+        :param host: SMTP server host
+        :param port: SMTP server port
+        :param starttls: If True, upgrade connections with STARTTLS
+        :param connections: Number of worker threads/SMTP connections
+        :param max_queued: Greatest number of messages waiting to be
+        sent; submitting blocks while the queue is full
+        :param retries: Number of times a failed send is retried
+        :param backoff: Delay in seconds before the first retry; each
+        further retry waits twice as long
+        """
+        self.sender = sender
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue(max_queued)
+        self.workers = [threading.Thread(
+            target=self.work, args=(Mailer(sender, host, port, starttls),),
+            daemon=True) for _ in range(connections)]
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def submit(self, msg):
+        """
+        Queues a message for delivery.
+        :param msg: EmailMessage (e.g., from build_email)
+        :return: concurrent.futures.Future resolving to a dictionary
+        mapping each recipient's email to "sent" or, if refused, to
+        the server's (code, response) pair
+        """
+        return self.put(msg)
+
+    def submit_email(self, recipients, subject, html, html_dir, cc=None,
+                     bcc=None, attachments=None, attachments_dir=None,
+                     stream=False):
+        """
+        Builds (see build_email) and queues an email from the queue's
+        sender using send_email's parameters.
+        :param stream: If True, the attachments are read and encoded
+        in chunks when the email is sent (see Mailer.send_streaming)
+        rather than held in memory while it waits in the queue
+        :return: concurrent.futures.Future (see MailQueue.submit)
+        """
+        if stream:
+            msg = build_email(self.sender, recipients, subject, html,
+                              html_dir, cc, bcc)
+            return self.put(msg, attachments, attachments_dir)
+        return self.submit(build_email(self.sender, recipients, subject,
+                                       html, html_dir, cc, bcc,
+                                       attachments, attachments_dir))
+
+    def put(self, msg, attachments=None, attachments_dir=None):
+        """
+        :param msg: EmailMessage to be queued
+        :param attachments: Attachments to be streamed with msg (see
+        Mailer.send_streaming), if any
+        :param attachments_dir: Directory containing the attachments
+        :return: concurrent.futures.Future (see MailQueue.submit)
+        """
+        future = concurrent.futures.Future()
+        self.queue.put((msg, future, attachments, attachments_dir))
+        return future
+
+    def work(self, mailer):
+        """
+        Worker thread loop: sends queued messages until a None
+        sentinel is received.
+        :param mailer: Mailer owned by this worker
+        """
+        with mailer:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                msg, future, attachments, attachments_dir = item
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(self.deliver(
+                            mailer, msg, attachments, attachments_dir))
+                    except Exception as error:
+                        future.set_exception(error)
+        return
+
+    def deliver(self, mailer, msg, attachments=None, attachments_dir=None):
+        """
+        Sends one message, retrying transient failures.
+        :param mailer: Mailer to send with
+        :param msg: EmailMessage to be sent
+        :param attachments: If given, attachments streamed with msg
+        (see Mailer.send_streaming)
+        :param attachments_dir: Directory containing the attachments
+        :return: Dictionary of per-recipient results (see submit)
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if attachments:
+                    refused = mailer.send_streaming(msg, attachments,
+                                                    attachments_dir)
+                else:
+                    refused = mailer.send(msg)
+                break
+            except smtplib.SMTPRecipientsRefused as error:                  # every recipient refused
+                refused = error.recipients
+                break
+            except (smtplib.SMTPException, OSError) as error:
+                permanent = (isinstance(error, smtplib.SMTPResponseException)
+                             and 500 <= error.smtp_code < 600)
+                if permanent or attempt == self.retries:
+                    raise
+                mailer.close()
+                time.sleep(self.backoff * 2 ** attempt)
+        addresses = email.utils.getaddresses(
+            msg.get_all('To', []) + msg.get_all('Cc', []) +
+            msg.get_all('Bcc', []))
+        return {address: refused.get(address, "sent")
+                for _, address in addresses}
+
+    def close(self, wait=True):
+        """
+        Stops the workers once every queued message has been handled.
+        :param wait: If True, block until the workers have finished
+        """
+        for _ in self.workers:
+            self.queue.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
+        return
+
+
+def send_email(sender, recipients, subject, html, html_dir, cc=None,
+               bcc=None, attachments=None, attachments_dir=None,
+               mailer=None, host='smtp.gmail.com', port=587, stream=False):
+    """
+    Sends out an SMTP email using SSL, HTML content, and any number of
+    attachments (including .zip). Recipients' names must have the form
+    "required_first_name optional_middle_name optional_last_name". The
+    sender's email is assumed to be Gmail/Google Inbox unless another
+    host is given.
+    :param sender: Sequence (a, b) where a is the sender's email and
+    b is their email account password
+    :param recipients: Sequence of pairs (a, b) where a is the
+    recipient's name and b is their email
+    :param cc: Sequence of pairs (a, b) where a is the cc
+    recipient's name and b is their email
+    :param bcc: Sequence of pairs (a, b) where a is the bcc
+    recipient's name and b is their email
+    :param subject: Subject title for the email
+    :param attachments: File name of the attachment (including
+    .zip), a pair (file name, bytes) for an attachment held in
+    memory, or a list of these for multiple attachments
+    :param html: File name of the html script defining the email
+    body's content and signature
+    :param attachments_dir: Directory containing the attachments
+    :param html_dir: Directory containing the html script
+    :param mailer: Optional open Mailer to send with (reusing its
+    connection); otherwise, a connection is opened for this email
+    :param host: SMTP server host (if no mailer is given)
+    :param port: SMTP server port (if no mailer is given)
+    :param stream: If True, the attachments are encoded and sent in
+    chunks (see Mailer.send_streaming) instead of being held in memory
+    :return: Dictionary of refused recipients
+    """
+    if stream:
+        msg = build_email(sender, recipients, subject, html, html_dir, cc,
+                          bcc)
+    else:
+        msg = build_email(sender, recipients, subject, html, html_dir, cc,
+                          bcc, attachments, attachments_dir)
 
     # Connect with the server and send the email with its attachment(s)
-    with smtplib.SMTP(host='smtp.gmail.com', port=587) as s:
-        context = ssl.create_default_context()
-        s.starttls(context=context)
-        s.login(sender[0], sender[1])
-        s.send_message(msg)
+    if mailer is None:
+        with Mailer(sender, host, port) as mailer:
+            if stream:
+                return mailer.send_streaming(msg, attachments,
+                                             attachments_dir)
+            return mailer.send(msg)
+    if stream:
+        return mailer.send_streaming(msg, attachments, attachments_dir)
+    return mailer.send(msg)
+
+
+def fit_width(max_len, min_width=16, max_width=50):
+    """
+    Clamps the longest cell length in a column to a readable
+    Excel column width.
+    :param max_len: Length of the longest string in the column
+    :param min_width: Narrowest width to be used
+    :param max_width: Widest width to be used
+    :return: Column width
+    """
+    return min(max(max_len, min_width), max_width)
 
-    return
+
+def column_runs(width, date_idx, formats=None):
+    """
+    Groups the columns of a row into contiguous runs of generic
+    and date columns sharing one format so that each run can be
+    written at once.
+    :param width: Number of columns in the row
+    :param date_idx: Pythonic indexes of the date columns
+    :param formats: Optional list of per-column Format objects
+    (None for the default generic/date format)
+    :return: List of quadruples (start, stop, is_date, cell_format)
+    """
+    date_idx = set(date_idx)
+    formats = formats or [None] * width
+    runs = list()
+    for col_py in range(width):
+        kind = [col_py in date_idx, formats[col_py]]
+        if runs and runs[-1][2:] == kind:
+            runs[-1][1] = col_py + 1
+        else:
+            runs.append([col_py, col_py + 1] + kind)
+    return [tuple(run) for run in runs]
+
+
+class FormatCache:
+    """
+    Registry of a workbook's xlsxwriter Format objects. Identical
+    format dictionaries map to a single cached Format, so styling
+    many columns or sheets never creates redundant format records.
+    """
+
+    def __init__(self, wb):
+        """
+        :param wb: xlsxwriter.Workbook owning the formats
+        """
+        self.wb = wb
+        self.formats = dict()
+
+    def get(self, properties):
+        """
+        :param properties: Dictionary of xlsxwriter format properties
+        :return: Cached Format object with these properties
+        """
+        key = tuple(sorted(properties.items()))
+        if key not in self.formats:
+            self.formats[key] = self.wb.add_format(dict(properties))
+        return self.formats[key]
+
+
+def epoch_micros(date):
+    """
+    :param date: Naive datetime.datetime object
+    :return: Whole microseconds since Excel's epoch (1899-12-30),
+    which, unlike a float serial date, round-trips exactly
+    """
+    return (date - EXCEL_EPOCH) // datetime.timedelta(microseconds=1)
+
+
+class DateColumn(array.array):
+    """
+    array.array ('q') of microseconds since Excel's epoch (see
+    epoch_micros) that reads back as datetimes via column_values()
+    """
+
+
+def column_storage(values):
+    """
+    Chooses the most compact storage for one column: a typed
+    array for all-integer, all-float, or all-date columns and a
+    plain list otherwise (mixed int/float columns stay lists so
+    integers keep their type and precision).
+    :param values: Iterable of cell values
+    :return: array.array, DateColumn, or list
+    """
+    if isinstance(values, array.array):
+        return values
+    values = list(values)
+    if not values:
+        return values
+    kinds = {type(value) for value in values}
+    if kinds == {int}:
+        try:
+            return array.array('q', values)
+        except OverflowError:
+            return values
+    if kinds == {float}:
+        return array.array('d', values)
+    if kinds == {datetime.datetime} and \
+            all(value.tzinfo is None for value in values):
+        return DateColumn('q', map(epoch_micros, values))
+    return values
+
+
+def column_values(column):
+    """
+    :param column: Column as returned by column_storage()
+    :return: Iterable of the column's cell values
+    """
+    if isinstance(column, DateColumn):
+        return [EXCEL_EPOCH + datetime.timedelta(microseconds=micros)
+                for micros in column]
+    return column
+
+
+def cell_matches(cell, test, value):
+    """
+    Evaluates a single XlArray.select predicate against a cell.
+    :param cell: Cell content
+    :param test: "==", "in", "range", or "tokens"
+    :param value: Value the cell is compared against
+    :return: True if the cell satisfies the predicate
+    """
+    try:
+        if test == "==":
+            return cell == value
+        if test == "in":
+            return cell in value
+        if test == "range":
+            low, high = value
+            return ((low is None or low <= cell) and
+                    (high is None or cell <= high))
+        # "tokens": if the cell and value are splittable, see if all
+        # components of the former are in the latter
+        if cell == value:
+            return True
+        value_tokens = value.split()
+        return all(token in value_tokens for token in cell.split())
+    except (TypeError, AttributeError):
+        return False
+
+
+MAX_XL_COL = 16384      # Excel's last column, "XFD"
+
+
+@functools.lru_cache(maxsize=MAX_XL_COL)
+def column_letter(col_num):
+    """
+    :param col_num: 1-based column number (e.g., 28)
+    :return: Excel column label (e.g., "AB")
+    """
+    if not isinstance(col_num, int) or not 1 <= col_num <= MAX_XL_COL:
+        raise ValueError(f"Column number {col_num!r} is outside A:XFD")
+    letters = list()
+    while col_num:
+        col_num, remainder = divmod(col_num - 1, 26)
+        letters.append(string.ascii_uppercase[remainder])
+    return "".join(reversed(letters))
+
+
+@functools.lru_cache(maxsize=MAX_XL_COL)
+def column_number(col_label):
+    """
+    :param col_label: Excel column label (e.g., "AB")
+    :return: 1-based column number (e.g., 28)
+    """
+    if not isinstance(col_label, str) or not col_label.isalpha() or \
+            not col_label.isascii():
+        raise ValueError(f"Invalid Excel column {col_label!r}")
+    col_num = 0
+    for letter in col_label.upper():
+        col_num = col_num * 26 + ord(letter) - ord("A") + 1
+    if col_num > MAX_XL_COL:
+        raise ValueError(f"Column {col_label!r} is outside A:XFD")
+    return col_num
+
+
+class ColumnConverter:
+    """
+    Read-only mapping between Excel column labels and column numbers
+    that computes (and caches) each conversion on demand instead of
+    building a full dictionary.
+    """
+
+    def __init__(self, convert, limit=MAX_XL_COL):
+        """
+        :param convert: column_letter or column_number
+        :param limit: Highest column number to be converted
+        """
+        self.convert = convert
+        self.limit = limit
+
+    def __getitem__(self, key):
+        try:
+            value = self.convert(key)
+        except ValueError:
+            raise KeyError(key) from None
+        if (value if isinstance(value, int) else key) > self.limit:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
 
 def range_converter(xl_col_length=3):
     """
     Construct conversions between Excel array ranges and
-    Pythonic indices (up to column ZZ in Excel)
+    Pythonic indices (up to column XFD in Excel). The returned
+    mappings convert arithmetically on demand, so this is cheap.
     :param xl_col_length: Length of the longest desired
-    Excel column (e.g., 2 for "A" to "ZZ", 3 for "A" to "ZZZ")
+    Excel column (e.g., 2 for "A" to "ZZ", 3 for "A" to "XFD")
+    :return: Pair of mappings (number -> label, label -> number)
     """
-    alpha_initial = string.ascii_uppercase
-    alpha_extended = list(string.ascii_uppercase)
-
-    if xl_col_length == 1:
-        pass
-    else:   # Expand list with same lexicographic ordering as
-        # Excel (e.g. "Z" is followed by "AA", "AZ" by "BA")
-        for k in range(2, xl_col_length + 1):
-            new_sequences = list()
-            for letter_sequence in alpha_extended:
-                for new_letter in alpha_initial:
-                    new_sequences.append("".join([letter_sequence,
-                                                  new_letter]))
-            alpha_extended.extend(new_sequences)
-    convert = zip(range(1, len(alpha_extended) + 1), alpha_extended)
-    convert_to_alpha = {x: y for x, y in convert}
-    convert_to_num = {y: x for x, y in convert_to_alpha.items()}
-    return convert_to_alpha, convert_to_num
+    limit = min(sum(26 ** k for k in range(1, xl_col_length + 1)),
+                MAX_XL_COL)
+    return (ColumnConverter(column_letter, limit),
+            ColumnConverter(column_number, limit))
 
 
 class XlArray:
@@ -325,6 +1428,7 @@ class XlArray:
         self.col = col
         self.row = row
         self.len = len(data)  # Indicates the number of rows
+        self.indexes = dict()  # Cached column indexes (see XlArray.index)
 
         # Determine the finalized Excel array range
         self.empty = empty_check(data)
@@ -332,7 +1436,8 @@ class XlArray:
             self.header = self.data[0]
             excel_range = (col + str(row) + ":" +
                            XlArray.convert_to_alpha[len(self.header) +
-                           XlArray.convert_to_num[col] - 1] + str(self.len))
+                           XlArray.convert_to_num[col] - 1] +
+                           str(int(row) + self.len - 1))
             # modified 5/24
             self.col_num = XlArray.convert_to_num[self.col]
             # XlArray.remove (below) may interfere with self.col_num
@@ -366,29 +1471,38 @@ class XlArray:
         strings) in the source array in Excel's range
         interpretation - e.g., "A" for the 0th column
         """
-        # Note that this section assumes no two rows/lists in the
-        # data array are identical due to list.index()
+        if self.empty:
+            return
+        if isinstance(columns, str):
+            columns = [columns]
+        width = len(self.header)
+        drop = set()
         for excluded_col in columns:
-            excluded_col_num = XlArray.convert_to_num[excluded_col]     # e.g., column "B" becomes 2
-            if not self.empty and excluded_col_num == self.col_num:     # if the first column is to be excluded
-                for record in self.data:
-                    index = self.data.index(record)
-                    self.data[index] = record[1:]                       # remove the first column in all rows
-                self.col = XlArray.convert_to_alpha[self.col_num + 1]   # adjust the Excel representation attributes
-                self.col_num = XlArray.convert_to_num[self.col]
-            elif not self.empty and excluded_col_num == \
-                    self.last_col_num:                                  # if the last column is to be excluded
-                for record in self.data:
-                    index = self.data.index(record)
-                    self.data[index] = record[:-1]
-            elif not self.empty and self.col_num < excluded_col_num \
-                    < self.last_col_num:                                # if another column is to be excluded
-                for record in self.data:
-                    index = self.data.index(record)
-                    self.data[index] = record[:excluded_col_num - 1] \
-                                       + record[excluded_col_num:]      # Pythonic indexes!
-            else:                                                       # if the column isn't in the instance array
-                pass
+            col_py = XlArray.convert_to_num[excluded_col] - self.col_num  # e.g., column "B" becomes 1 if self.col is "A"
+            if 0 <= col_py < width:                                     # ignore columns outside the instance array
+                drop.add(col_py)
+        if not drop:
+            return
+        keep = [col_py for col_py in range(width) if col_py not in drop]
+        self.indexes.clear()                                            # column positions are about to shift
+
+        # Rebuild every row once (in place, so duplicate rows and
+        # outside references to self.data are handled correctly)
+        self.data[:] = [[record[col_py] for col_py in keep
+                         if col_py < len(record)] + record[width:]
+                        for record in self.data]
+
+        # Adjust the Excel representation attributes
+        leading = 0
+        while leading in drop:                                          # leading columns shift the array right
+            leading += 1
+        self.col_num += leading
+        self.col = XlArray.convert_to_alpha[self.col_num]
+        self.header = self.data[0]
+        self.last_col_num = self.col_num + len(self.header) - 1
+        self.last_col = XlArray.convert_to_alpha[self.last_col_num]
+        self.range = (self.col + str(self.row) + ":" + self.last_col
+                      + str(int(self.row) + self.len - 1))
         return
 
     def filter(self, column, value, strict=True):
@@ -402,29 +1516,202 @@ class XlArray:
         :return: Filtered copy of the array with only those
         rows containing the desired entry in the desired column
         """
+        if strict:
+            return self.select([(column, "==", value)])
+        return self.select([(column, "tokens", value)])
+
+    def index(self, column):
+        """
+        Builds (once) and returns a hash index of the chosen column.
+        The index is cached in self.indexes and discarded by
+        XlArray.remove; call self.indexes.clear() after editing
+        self.data directly.
+        :param column: Pythonic index of the column to be indexed
+        :return: Dictionary mapping each cell value to the ascending
+        row positions (in self.data) holding it, or None if the
+        column contains unhashable values
+        """
+        if column not in self.indexes:
+            col_index = dict()
+            try:
+                for position, record in enumerate(self.data):
+                    value = record[column] if column < len(record) else None
+                    col_index.setdefault(value, []).append(position)
+            except TypeError:                                   # unhashable cell content
+                col_index = None
+            self.indexes[column] = col_index
+        return self.indexes[column]
+
+    def select(self, predicates):
+        """
+        Filters the array by several predicates at once. Equality
+        and set-membership predicates are answered from the cached
+        column indexes (see XlArray.index), so repeated filters only
+        visit the matching rows; the remaining predicates are then
+        checked on those rows in one pass.
+        :param predicates: Triples (column, test, value) where column
+        is a Pythonic index and test is one of
+            "==": the cell equals value
+            "in": the cell is in the collection value
+            "range": low <= cell <= high for value = (low, high);
+                either bound may be None
+            "tokens": every word of the cell is a word of value
+        :return: XlArray with only those rows satisfying every
+        predicate (its row attribute is the Excel row of the first
+        match)
+        """
+        candidates = None
+        checks = list()
+        for column, test, value in predicates:
+            if test not in ("==", "in", "range", "tokens"):
+                raise ValueError(f"Unknown filter test '{test}'")
+            col_index = self.index(column) if test in ("==", "in") \
+                else None
+            if col_index is None:
+                checks.append((column, test, value))
+                continue
+            if test == "==":
+                try:
+                    positions = set(col_index.get(value, ()))
+                except TypeError:                               # unhashable value matches nothing
+                    positions = set()
+            else:
+                positions = set()
+                for item in value:
+                    try:
+                        positions.update(col_index.get(item, ()))
+                    except TypeError:                           # unhashable items match nothing
+                        continue
+            candidates = positions if candidates is None \
+                else candidates & positions
+        if candidates is None:
+            candidates = range(len(self.data))
+        else:
+            candidates = sorted(candidates)
+
         filtered_array = list()
-        filter_row = ""
-        for record in self.data:                            # Here, rows are represented by lists
-            if record[column] == value:                     # Strict equivalency required for a match
-                if not filter_row:                          # Determine upper-left range value for the filtered array
-                    filter_row = (self.data.index(record)
-                                  + self.row - 1)
+        filter_row = None
+        for position in candidates:
+            record = self.data[position]
+            if all(cell_matches(record[column] if column < len(record)
+                                else None, test, value)
+                   for column, test, value in checks):
+                if filter_row is None:                          # Determine upper-left range value for the filtered array
+                    filter_row = position + self.row
                 filtered_array.append(record)
-            elif not strict:
-                if not filter_row:                          # Determine upper-left range value for the filtered array
-                    filter_row = (self.data.index(record)
-                                  + self.row - 1)
-                try:
-                    # if record[column] and value are splittable,
-                    # see if all components of the former are in the latter
-                    entry = record[column].split()
-                    if all(entry[i] in value.split() for
-                           i in list(range(len(entry)))):
-                        filtered_array.append(record)
-                except TypeError:
-                    pass
 
-        return XlArray(filtered_array, filter_row, self.col)
+        return XlArray(filtered_array, filter_row or self.row, self.col)
+
+    def to_columns(self):
+        """
+        :return: XlColumns copy of the array
+        """
+        return XlColumns.from_array(self)
+
+
+class XlColumns:
+    """
+    Class Dependency: XlArray
+
+    Column-oriented counterpart of XlArray. Each column is stored
+    separately: numeric columns as compact arrays of machine
+    integers/doubles, date columns as arrays of microseconds since
+    Excel's epoch, and everything else as a plain list. Column
+    removal is a single delete and filters/width scans walk one
+    column at a time.
+    """
+
+    def __init__(self, header, columns, row=1, col="A"):
+        """
+        :param header: Sequence of column names
+        :param columns: Sequence of columns (lists or arrays), one
+        per header entry, each holding the values below the header
+        :param row: Row location of the header (in Excel format)
+        :param col: Column location of the first column (in Excel
+        format - e.g., "B")
+        """
+        self.header = list(header)
+        self.columns = [column_storage(column) for column in columns]
+        self.row = row
+        self.col = col
+        self.len = len(self.columns[0]) + 1 if self.columns else 1
+
+    @classmethod
+    def from_array(cls, xl_array):
+        """
+        :param xl_array: XlArray whose first row is its header
+        :return: XlColumns holding the same data
+        """
+        if xl_array.empty:
+            return cls([], [], xl_array.row, xl_array.col)
+        width = len(xl_array.header)
+        body = xl_array.data[1:]
+        columns = [[record[col_py] if col_py < len(record) else None
+                    for record in body] for col_py in range(width)]
+        return cls(xl_array.header, columns, xl_array.row, xl_array.col)
+
+    def to_array(self):
+        """
+        :return: XlArray (row-oriented) copy of the data
+        """
+        columns = [column_values(column) for column in self.columns]
+        data = [list(self.header)] + [list(record) for record in
+                                      zip(*columns)]
+        return XlArray(data, self.row, self.col)
+
+    def remove(self, columns):
+        """
+        Removes the chosen columns (in Excel range terms, as in
+        XlArray.remove).
+        :param columns: Column (as string) or columns (as list of
+        strings)
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        col_num = XlArray.convert_to_num[self.col]
+        drop = {XlArray.convert_to_num[col] - col_num for col in columns}
+        drop = {col_py for col_py in drop if 0 <= col_py < len(self.header)}
+        keep = [col_py for col_py in range(len(self.header))
+                if col_py not in drop]
+        leading = 0
+        while leading in drop:
+            leading += 1
+        self.header = [self.header[col_py] for col_py in keep]
+        self.columns = [self.columns[col_py] for col_py in keep]
+        self.col = XlArray.convert_to_alpha[col_num + leading]
+        return
+
+    def filter(self, column, value):
+        """
+        :param column: Pythonic index of the column to be searched
+        :param value: The cell content that will be searched for
+        :return: Filtered XlColumns with only those rows containing
+        the desired entry in the desired column
+        """
+        target = self.columns[column]
+        if isinstance(target, DateColumn):
+            if isinstance(value, datetime.datetime) and \
+                    value.tzinfo is None:
+                value = epoch_micros(value)
+            else:
+                value = None                                                # anything else matches no date
+        mask = [item == value for item in target]
+        columns = list()
+        for col in self.columns:
+            if isinstance(col, array.array):                                # keeps DateColumn and typecode
+                columns.append(type(col)(col.typecode,
+                                         itertools.compress(col, mask)))
+            else:
+                columns.append(list(itertools.compress(col, mask)))
+        return XlColumns(self.header, columns, self.row, self.col)
+
+    def widths(self):
+        """
+        :return: Length of the longest value (as a string) in each
+        column, excluding the header
+        """
+        return [max(map(len, map(str, column_values(column))), default=0)
+                for column in self.columns]
 
 
 class XlExtract:
@@ -432,27 +1719,51 @@ class XlExtract:
     Class Dependency: XlArray (for XlEdit.extract())
 
     Extract data from an existing Excel documents using
-    the xlwings module.
+    the xlwings module. Each instance runs its own hidden Excel
+    application and quits only that application when closed, so
+    separate instances can be used from concurrent threads.
     """
 
     def __init__(self, dir_path):
-        hide_excel(True)
+        if xw is None:
+            raise ImportError("XlExtract requires xlwings and Excel; use "
+                              "XlFileExtract for .xlsx/.xlsm workbooks")
         self.path = dir_path
         self.name = os.path.split(dir_path)[1]
         self.date = mod_date(dir_path)
-        self.wb = xw.Book(self.path)                                        # xw.books.open(self.path) returns error
+        self.com_initialized = False
+        if pythoncom is not None and \
+                threading.current_thread() is not threading.main_thread():
+            pythoncom.CoInitialize()                                        # COM must be initialized per thread
+            self.com_initialized = True
+        try:
+            self.app = xw.App(visible=False, add_book=False)
+            self.app.display_alerts = False
+            self.app.screen_updating = False
+            self.wb = self.app.books.open(self.path)
+        except Exception:
+            self.close()
+            raise
         self.sheets = self.wb.sheets
 
     def open(self):
-        hide_excel(True)
         return self.wb
 
     def close(self):
-        try:
-            hide_excel(False)
-            self.wb.close()
-        finally:
-            return
+        """
+        Closes the workbook and quits this instance's Excel application
+        (other Excel processes are left running).
+        """
+        app, self.app = getattr(self, "app", None), None
+        if app is not None:
+            try:
+                app.quit()                                                  # closes the workbook without saving
+            except Exception:
+                app.kill()
+        if self.com_initialized:
+            pythoncom.CoUninitialize()
+            self.com_initialized = False
+        return
 
     def init_sht(self, sheet_name, prior_sheet=None):
         """
@@ -469,7 +1780,7 @@ class XlExtract:
         pass
 
     def extract(self, exclude_sheets=None, exclude_cols=None,
-                max_row=50000, max_col=100):
+                max_row=50000, max_col=100, use_used_range=False):
         """
         Imports all data in the workbook with each sheet represented
         by a different XlArray object
@@ -479,59 +1790,391 @@ class XlExtract:
         name and b lists the columns to be excluded
         :param max_row: Rows beyond this point will not be extracted
         :param max_col: Columns beyond this point will not be extracted
+        :param use_used_range: If True, only Excel's used range
+        (capped by max_row and max_col) is read from each sheet
         :return: Pairs consisting of each sheet number and the array in
         that sheet with all empty rows removed.
         """
         wb_data = list()
         if exclude_sheets:
-            sht_list = [sheet.name for sheet in self.sheets if sheet
+            sht_list = [sheet.name for sheet in self.sheets if sheet.name
                         not in exclude_sheets]
         else:
             sht_list = [sheet.name for sheet in self.sheets]
-        for sht_name in sht_list:
-            sht_xl = self.wb.sheets(sht_name)
-
-            # Determine endpoints of the range to be extracted
-            raw_data = sht_xl.range((1, 1), (max_row, max_col)).value
-            col_len, row_len = list(), -1
-            for row in raw_data:
-                if empty_check(row):
-                    row_len += 1
-                    break
+        try:
+            for sht_name in sht_list:
+                sht_xl = self.wb.sheets(sht_name)
+
+                # Read the block once (narrowed to Excel's own used
+                # range if requested) and trim it in memory
+                last_row, last_col = max_row, max_col
+                if use_used_range:
+                    last_cell = sht_xl.used_range.last_cell
+                    last_row = min(last_cell.row, max_row)
+                    last_col = min(last_cell.column, max_col)
+                raw_data = sht_xl.range((1, 1), (last_row, last_col)) \
+                    .options(ndim=2).value
+                sht_array = block_to_array(raw_data, sht_name, exclude_cols)
+                wb_data.append((sht_xl.index - 1, sht_array))                       # sht.index is 1-based (as in Excel)
+        finally:
+            self.close()                                                    # quit this Excel even on failure
+        return wb_data
+
+    def extract_pages(self, exclude_sheets=None, exclude_cols=None,
+                      page_rows=1000, max_row=50000, max_col=100):
+        """
+        Generator version of XlExtract.extract that reads each sheet
+        in pages of page_rows rows and yields each page as soon as it
+        has been read. A sheet is considered finished at its first
+        completely empty page. Each sheet's column extent is taken
+        from Excel's used range (capped by max_col) and every page is
+        padded to it, so all fragments of a sheet have the same width.
+        The workbook is closed once the generator is exhausted (or
+        closed).
+        :param exclude_sheets: List of the names of the sheets from
+        which data won't be collected
+        :param exclude_cols: List of pairs (a,b) where a is the sheet
+        name and b lists the columns to be excluded
+        :param page_rows: Number of rows read from Excel per request
+        :param max_row: Rows beyond this point will not be extracted
+        :param max_col: Columns beyond this point will not be extracted
+        :return: Pairs consisting of each sheet number and an XlArray
+        fragment of that sheet (with empty rows removed) whose row
+        attribute is its starting Excel row
+        """
+        try:
+            for sheet in self.sheets:
+                if exclude_sheets and sheet.name in exclude_sheets:
+                    continue
+                sht_xl = self.wb.sheets(sheet.name)
+                width = min(sht_xl.used_range.last_cell.column, max_col)       # one width for every page of the sheet
+                for first_row in range(1, max_row + 1, page_rows):
+                    last_row = min(first_row + page_rows - 1, max_row)
+                    page = sht_xl.range((first_row, 1), (last_row, width)) \
+                        .options(ndim=2).value
+                    if all(empty_mask(page)[0]):
+                        break
+                    fragment = block_to_array(page, sheet.name,
+                                              exclude_cols, first_row, width)
+                    yield sht_xl.index - 1, fragment                        # sht.index is 1-based (as in Excel)
+        finally:
+            self.close()
+
+
+class XlFileExtract:
+    """
+    Class Dependency: XlArray (for XlFileExtract.extract())
+
+    Extract data from an existing .xlsx/.xlsm workbook by parsing the
+    file directly (streaming each sheet's XML out of the zip archive)
+    rather than automating Excel. This works without Excel or
+    xlwings, so it can run headless and in parallel. Cell values
+    follow xlwings' conventions: numbers are floats, date-formatted
+    numbers are datetimes, and blank cells are None.
+    """
+    NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    NS_REL = ("{http://schemas.openxmlformats.org/officeDocument/2006/"
+              "relationships}")
+    NS_PKG = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+    DATE_FORMAT_IDS = (set(range(14, 23)) | set(range(27, 37)) |
+                       set(range(45, 48)) | set(range(50, 59)))             # Built-in date/time number formats
+
+    def __init__(self, dir_path):
+        self.path = dir_path
+        self.name = os.path.split(dir_path)[1]
+        self.date = datetime.datetime.fromtimestamp(
+            os.path.getmtime(dir_path))
+        self.zip = zipfile.ZipFile(dir_path)
+        self.epoch = EXCEL_EPOCH
+        self.sheet_paths = dict()
+        self.sheets = list()                                                # Sheet names in workbook order
+        try:
+            self.read_workbook()
+            self.shared_strings = self.read_shared_strings()
+            self.date_styles = self.read_date_styles()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        self.zip.close()
+        return
+
+    def read_workbook(self):
+        """
+        Collects the sheet names (in workbook order), the XML part of
+        each sheet, and the workbook's date system.
+        """
+        targets = dict()
+        with self.zip.open("xl/_rels/workbook.xml.rels") as rels:
+            for rel in ElementTree.parse(rels).getroot():
+                target = rel.get("Target")
+                if target.startswith("/"):
+                    target = target[1:]
                 else:
-                    row_len += 1
-                    j = -1
-                    while j in list(range(-1, len(row))):
-                        j += 1
-                        if empty_check(row[j:]):
-                            col_len.append(j)
-                            break
-            col_len = max(col_len)
-
-            if col_len < max_col and row_len < max_row:
-                last_cell_location = (XlArray.convert_to_alpha[col_len]
-                                      + str(row_len))
-            else:
-                last_cell_location = (XlArray.convert_to_alpha[max_col]
-                                      + str(max_row))
-            sht_range = "A1:" + last_cell_location
-            sht_data = sht_xl.range(sht_range).value
-            sht_array = XlArray(sht_data, 1, "A")
-            for row in sht_array.data:
-                if empty_check(row):
-                    sht_array.data.remove(row)
-            try:
-                for x_sheet, x_columns in exclude_cols:
-                    if x_sheet == sht_name:
-                        sht_array.remove(x_columns)
-            except TypeError:                                                       # raised if no columns excluded
-                pass
-            wb_data.append((sht_xl.index - 1, sht_array))                           # sht.index is 1-based (as in Excel)
+                    target = "xl/" + target
+                targets[rel.get("Id")] = target
+        with self.zip.open("xl/workbook.xml") as workbook:
+            root = ElementTree.parse(workbook).getroot()
+        properties = root.find(self.NS_MAIN + "workbookPr")
+        if properties is not None and \
+                properties.get("date1904") in ("1", "true"):
+            self.epoch = datetime.datetime(1904, 1, 1)
+        for sheet in root.iter(self.NS_MAIN + "sheet"):
+            name = sheet.get("name")
+            self.sheets.append(name)
+            self.sheet_paths[name] = targets[sheet.get(self.NS_REL + "id")]
+        return
 
-        self.close()
+    def read_shared_strings(self):
+        """
+        :return: List of the workbook's shared strings
+        """
+        strings = list()
+        if "xl/sharedStrings.xml" not in self.zip.namelist():
+            return strings
+        with self.zip.open("xl/sharedStrings.xml") as shared:
+            for _, elem in ElementTree.iterparse(shared):
+                if elem.tag == self.NS_MAIN + "si":
+                    strings.append("".join(
+                        t.text or "" for t in elem.iter(self.NS_MAIN + "t")))
+                    elem.clear()
+        return strings
+
+    def read_date_styles(self):
+        """
+        :return: Set of cell style indexes whose number format
+        represents a date
+        """
+        date_styles = set()
+        if "xl/styles.xml" not in self.zip.namelist():
+            return date_styles
+        with self.zip.open("xl/styles.xml") as styles:
+            root = ElementTree.parse(styles).getroot()
+        date_formats = set(self.DATE_FORMAT_IDS)
+        for num_fmt in root.iter(self.NS_MAIN + "numFmt"):
+            code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', "",
+                          num_fmt.get("formatCode", "")).lower()
+            if re.search(r"[dmyhs]", code):
+                date_formats.add(int(num_fmt.get("numFmtId")))
+        cell_xfs = root.find(self.NS_MAIN + "cellXfs")
+        if cell_xfs is not None:
+            for style, xf in enumerate(cell_xfs.iter(self.NS_MAIN + "xf")):
+                if int(xf.get("numFmtId", 0)) in date_formats:
+                    date_styles.add(style)
+        return date_styles
+
+    def cell_value(self, cell):
+        """
+        :param cell: <c> element of a sheet's XML
+        :return: Python value of the cell
+        """
+        cell_type = cell.get("t", "n")
+        if cell_type == "inlineStr":
+            return "".join(t.text or "" for t in
+                           cell.iter(self.NS_MAIN + "t"))
+        value = cell.findtext(self.NS_MAIN + "v")
+        if value is None:
+            return None
+        if cell_type == "s":
+            return self.shared_strings[int(value)]
+        if cell_type == "b":
+            return value == "1"
+        if cell_type in ("str", "e"):
+            return value
+        if cell_type == "d":
+            return datetime.datetime.fromisoformat(value)
+        number = float(value)
+        if int(cell.get("s", 0)) in self.date_styles:
+            return self.epoch + datetime.timedelta(days=number)
+        return number
+
+    def read_sheet(self, sheet_name, max_row=50000, max_col=100):
+        """
+        Streams a sheet's XML and returns its cells as a 2-D block
+        (as xlwings' Range.value would), skipping rows with no cells.
+        :param sheet_name: Name of the sheet to be read
+        :param max_row: Rows beyond this point will not be read
+        :param max_col: Columns beyond this point will not be read
+        :return: List of rows (lists) starting in column A
+        """
+        block = list()
+        with self.zip.open(self.sheet_paths[sheet_name]) as sheet_xml:
+            for _, elem in ElementTree.iterparse(sheet_xml):
+                if elem.tag != self.NS_MAIN + "row":
+                    continue
+                if int(elem.get("r", len(block) + 1)) > max_row:
+                    break
+                record = list()
+                for cell in elem.iter(self.NS_MAIN + "c"):
+                    ref = cell.get("r")
+                    col_num = (column_number(ref.rstrip("0123456789"))
+                               if ref else len(record) + 1)
+                    if col_num > max_col:
+                        continue
+                    record.extend([None] * (col_num - len(record) - 1))
+                    record.append(self.cell_value(cell))
+                block.append(record)
+                elem.clear()
+        return block
+
+    def extract(self, exclude_sheets=None, exclude_cols=None,
+                max_row=50000, max_col=100):
+        """
+        Imports all data in the workbook with each sheet represented
+        by a different XlArray object (see XlExtract.extract)
+        :param exclude_sheets: List of the names of the sheets from
+        which data won't be collected
+        :param exclude_cols: List of pairs (a,b) where a is the sheet
+        name and b lists the columns to be excluded
+        :param max_row: Rows beyond this point will not be extracted
+        :param max_col: Columns beyond this point will not be extracted
+        :return: Pairs consisting of each sheet number and the array in
+        that sheet with all empty rows removed.
+        """
+        wb_data = list()
+        try:
+            for sht_index, sht_name in enumerate(self.sheets):
+                if exclude_sheets and sht_name in exclude_sheets:
+                    continue
+                raw_data = self.read_sheet(sht_name, max_row, max_col)
+                sht_array = block_to_array(raw_data, sht_name, exclude_cols)
+                wb_data.append((sht_index, sht_array))
+        finally:
+            self.close()
         return wb_data
-        # create a range method here that opens a chosen sheet and
-        # scans it for the first completely empty row & column
+
+
+def extract_workbook(path, headless=True, **extract_options):
+    """
+    Extracts one workbook, using XlFileExtract for .xlsx/.xlsm files
+    (if headless) and XlExtract otherwise.
+    :param path: Path of the workbook
+    :param headless: If True, parse Open XML workbooks directly
+    rather than through Excel
+    :param extract_options: Keyword arguments for extract()
+    :return: Pairs consisting of each sheet number and its XlArray
+    """
+    if is_headless(path, headless):
+        workbook = XlFileExtract(path)
+    else:
+        workbook = XlExtract(path)
+    try:
+        return workbook.extract(**extract_options)
+    finally:
+        workbook.close()                                                    # also on failure (e.g., bad options)
+
+
+def is_headless(path, headless=True):
+    """
+    :param path: Path of a workbook
+    :param headless: If False, every workbook is read through Excel
+    :return: True if the workbook can be read by XlFileExtract
+    """
+    return headless and \
+        os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm")
+
+
+def extract_many(paths, max_workers=None, headless=True, **extract_options):
+    """
+    Extracts many workbooks concurrently in a process pool. Workbooks
+    that must be read through Excel (see is_headless) are extracted
+    one at a time in the calling process while the pool works. A
+    failure in one workbook does not stop the others.
+    :param paths: Sequence of workbook paths
+    :param max_workers: Number of worker processes (defaults to the
+    number of CPUs)
+    :param headless: If True, parse Open XML workbooks directly
+    rather than through Excel (see extract_workbook)
+    :param extract_options: Keyword arguments for extract(), e.g.
+    exclude_sheets, exclude_cols, max_row, max_col
+    :return: Dictionary mapping each path to its extract() result or,
+    if extraction failed, to the exception raised
+    """
+    results = dict()
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        futures = {executor.submit(extract_workbook, path, headless,
+                                   **extract_options): path
+                   for path in paths if is_headless(path, headless)}
+        for path in paths:
+            if not is_headless(path, headless):
+                try:
+                    results[path] = extract_workbook(path, headless,
+                                                     **extract_options)
+                except Exception as error:                                  # captured per workbook
+                    results[path] = error
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as error:                                      # captured per workbook
+                results[futures[future]] = error
+    return {path: results[path] for path in paths}
+
+
+def export_workbook(filename, dir_path, sheets, constant_memory=False):
+    """
+    Writes one workbook with XlCreate.
+    :param filename: Name of the new workbook (without extension)
+    :param dir_path: Directory where the workbook will be saved
+    :param sheets: Dictionary mapping each sheet name to its data
+    (as for XlCreate.write) or to a dictionary of keyword arguments
+    for XlCreate.write (including sheet_data)
+    :param constant_memory: Passed to XlCreate (each sheet then gets
+    an autofilter rather than an Excel table)
+    :return: Path of the new workbook
+    """
+    with XlCreate(filename, dir_path, constant_memory) as workbook:
+        for sheet_name, sheet_data in sheets.items():
+            if isinstance(sheet_data, dict):
+                workbook.write(sheet_name, **sheet_data)
+            else:
+                workbook.write(sheet_name, sheet_data)
+    return os.path.join(dir_path, filename + ".xlsx")
+
+
+def export_many(jobs, dir_path, max_workers=None, max_pending=None,
+                constant_memory=False):
+    """
+    Writes many independent workbooks concurrently in a process pool
+    (each worker owns its own xlsxwriter.Workbook). Jobs are
+    submitted from the iterable only as earlier ones finish, so at
+    most max_pending jobs are held in memory at once. A failure in
+    one workbook does not stop the others.
+    :param jobs: Iterable of pairs (filename, sheets) as accepted by
+    export_workbook
+    :param dir_path: Directory where the workbooks will be saved
+    :param max_workers: Number of worker processes (defaults to the
+    number of CPUs)
+    :param max_pending: Greatest number of jobs submitted but not yet
+    finished (defaults to twice the number of workers)
+    :param constant_memory: Passed to XlCreate
+    :return: Dictionary mapping each filename to the path of its
+    workbook or, if writing failed, to the exception raised
+    """
+    if max_pending is None:
+        max_pending = 2 * (max_workers or os.cpu_count() or 1)
+    results, order = dict(), list()
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        pending = dict()
+        jobs = iter(jobs)
+        while True:
+            for filename, sheets in itertools.islice(
+                    jobs, max(max_pending - len(pending), 0)):
+                future = executor.submit(export_workbook, filename, dir_path,
+                                         sheets, constant_memory)
+                pending[future] = filename
+                order.append(filename)
+            if not pending:
+                break
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                filename = pending.pop(future)
+                try:
+                    results[filename] = future.result()
+                except Exception as error:                                  # captured per workbook
+                    results[filename] = error
+    return {filename: results[filename] for filename in order}
 
 
 class XlCreate:
@@ -542,30 +2185,69 @@ class XlCreate:
         formatting. Instantiating immediately opens a new
         Excel workbook, so consider instantiating within a "with" statement.
         (Otherwise, use XlCreate.close()) No extension is to be included
-        in the filename.
+        in the filename. The workbook is written with xlsxwriter and
+        never touches the working directory or a running Excel, so
+        separate instances can be used from concurrent threads.
     """
-    def __init__(self, filename, dir_path):
-        self.initial_dir = os.getcwd()
-        os.chdir(dir_path)
+    HEADER_FORMAT = {'bold': True, 'text_wrap': 1}                          # Bold/wrap the header
+    WRAP_FORMAT = {'text_wrap': 1, 'align': 'top'}
+    DATE_FORMAT = {'num_format': 'm/d/yy', 'align': 'top'}
+
+    def __init__(self, filename, dir_path=None, constant_memory=False,
+                 in_memory=False):
+        """
+        :param filename: Name of the new workbook (without extension)
+        :param dir_path: Directory where the workbook will be saved
+        (unused if in_memory)
+        :param constant_memory: If True, rows are flushed to disk as
+        soon as the next row is started (see XlCreate.write_stream).
+        Cells must then be written in row order, and since xlsxwriter
+        cannot add Excel tables in this mode, XlCreate.write applies
+        an autofilter to the header instead of a table.
+        :param in_memory: If True, the workbook is written to a bytes
+        buffer instead of a file; XlCreate.close() returns its bytes.
+        Unless constant_memory is also True, no temporary files are
+        used either.
+        """
         self.path = dir_path
-        self.name = os.path.split(dir_path)[1]
-        hide_excel(True)
-        self.wb = xlsxwriter.Workbook(filename + ".xlsx")
+        self.name = os.path.split(dir_path)[1] if dir_path else ""
+        self.filename = filename + ".xlsx"
+        if in_memory:
+            self.output = io.BytesIO()
+            target = self.output
+        else:
+            self.output = None
+            target = os.path.join(dir_path, self.filename)
+        self.constant_memory = constant_memory
+        self.wb = xlsxwriter.Workbook(target, {
+            'constant_memory': constant_memory,
+            'in_memory': in_memory and not constant_memory})
         self.arrays = dict()
-        self.header_bold = self.wb.add_format({'bold': True,
-                                               'text_wrap': 1})             # Format object: Bold/wrap the header
-        self.wrap = self.wb.add_format({'text_wrap': 1, 'align': 'top'})
-        self.date_format = self.wb.add_format({'num_format': 'm/d/yy',
-                                               'align': 'top'})             # Format object
+        self.formats = FormatCache(self.wb)
+        self.header_bold = self.formats.get(XlCreate.HEADER_FORMAT)        # Format objects
+        self.wrap = self.formats.get(XlCreate.WRAP_FORMAT)
+        self.date_format = self.formats.get(XlCreate.DATE_FORMAT)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
 
     def close(self):
+        """
+        :return: The workbook's bytes if created in_memory; otherwise,
+        None
+        """
         self.wb.close()
-        hide_excel(False)
-        os.chdir(self.initial_dir)
+        if self.output is not None:
+            return self.output.getvalue()
         return
 
     def write(self, sheet_name, sheet_data, row=1, column="A",
-              date_col=None, custom_width=None):
+              date_col=None, custom_width=None, width_sample=None,
+              col_formats=None):
         """
         Adds a mapping between the new sheet name and its data
         to self.arrays. Writes the data to the new sheet.
@@ -580,12 +2262,16 @@ class XlCreate:
         written as dates
         :param custom_width: Pairs (column, width) that determine
         column-specific width
+        :param width_sample: If given, column widths are fitted to
+        the first width_sample rows only
+        :param col_formats: Dictionary mapping columns (in Excel
+        format) to dictionaries of xlsxwriter format properties, e.g.,
+        {"C": {'num_format': '$#,##0.00'}}
         """
 
-        # Construct conversions between Excel array ranges and Pythonic indices
-        converter = range_converter()
-        convert_to_alpha = converter[0]
-        convert_to_num = converter[1]
+        # Conversions between Excel array ranges and Pythonic indices
+        convert_to_alpha = XlArray.convert_to_alpha
+        convert_to_num = XlArray.convert_to_num
 
         # Add mapping between new sheet name and its
         # data (translated into a XlArray object)
@@ -601,13 +2287,20 @@ class XlCreate:
             self.header_bold} for col in data.header]
         # 5/23 This is running correctly
 
-        # Insert the table and its data
-        sht.add_table(data.range, {'columns': header_formatting,
-                                   'name': table_name})
-        for item in data.header:
-            sht.write(0, data.col_num + data.header.index(item)
-                      - 1, item, self.header_bold)
-            # 5/24: added -1 above, verify that this works
+        # Insert the table and its data (an autofilter is used instead
+        # for a header-only sheet, since Excel tables need at least one
+        # data row, and in constant_memory mode, where xlsxwriter
+        # cannot add tables)
+        first_row = int(data.row) - 1                                       # sht.write() uses 0-base indexes
+        first_col = data.col_num - 1
+        if data.len > 1 and not self.constant_memory:
+            sht.add_table(data.range, {'columns': header_formatting,
+                                       'name': table_name})
+        else:
+            sht.autofilter(first_row, first_col, first_row + data.len - 1,
+                           first_col + len(data.header) - 1)
+        for col_py, item in enumerate(data.header):
+            sht.write(first_row, first_col + col_py, item, self.header_bold)
         all_columns_xl = list()
         # represents the destination columns
         all_columns_py = dict()
@@ -617,39 +2310,315 @@ class XlCreate:
         for col in all_columns_xl:
             all_columns_py[col] = convert_to_num[col] -\
                                   convert_to_num[all_columns_xl[0]]
+        # Classify each column once, then write each row in bulk
+        date_idx = [all_columns_py[col] for col in all_columns_xl
+                    if date_col and col in date_col]
+        runs = column_runs(len(all_columns_xl), date_idx,
+                           self.column_formats(first_col, len(all_columns_xl),
+                                               date_idx, col_formats))
+        max_lens = [0] * len(all_columns_xl)
         for row_py in range(1, data.len):
-            for col in all_columns_xl:
-                col_py = all_columns_py[col]
-                if date_col and col in date_col:
-                    if not isinstance(data.data[row_py][col_py],
-                                      datetime.datetime):
-                        sht.write(row_py, col_py, "NO DATE",
-                                  self.date_format)                                 # sht.write() uses 0-base indexes
-                    else:
-                        sht.write_datetime(row_py, col_py,
-                                           data.data[row_py][col_py],
-                                           self.date_format)
-                else:
-                    sht.write(row_py, col_py,
-                              data.data[row_py][col_py], self.wrap)
+            self.write_record(sht, first_row + row_py, first_col,
+                              data.data[row_py], runs,
+                              max_lens if not width_sample or
+                              row_py <= width_sample else None)
 
         # Adjust the column widths
-        for col in all_columns_xl:
-            if not custom_width or col not in custom_width:
-                col_py = all_columns_py[col]
-                len_lst = [len(str(record[col_py])) for
-                           record in data.data[1:]]
-                if not len_lst:
-                    max_len = 16
-                elif max(len_lst) > 50:
-                    max_len = 50
+        self.set_widths(sht, first_col, max_lens, custom_width)
+        return
+
+    def write_record(self, sht, row_xl, first_col, record, runs,
+                     max_lens=None):
+        """
+        Writes one row using runs precomputed by column_runs():
+        generic runs are written with a single write_row() call while
+        date columns are written cell by cell.
+        :param sht: xlsxwriter worksheet
+        :param row_xl: 0-based sheet row to be written
+        :param first_col: 0-based sheet column of record[0]
+        :param record: Sequence of cell values
+        :param runs: Quadruples (start, stop, is_date, cell_format) as
+        returned by column_runs()
+        :param max_lens: Optional list of the longest value length
+        seen in each column, updated in place with this row
+        """
+        if max_lens is not None:
+            for col_py, value in enumerate(record[:len(max_lens)]):
+                length = len(str(value))
+                if length > max_lens[col_py]:
+                    max_lens[col_py] = length
+        for start, stop, is_date, cell_format in runs:
+            if not is_date:
+                sht.write_row(row_xl, first_col + start, record[start:stop],
+                              cell_format or self.wrap)
+                continue
+            cell_format = cell_format or self.date_format
+            for col_py in range(start, min(stop, len(record))):
+                value = record[col_py]
+                if not isinstance(value, datetime.datetime):
+                    sht.write(row_xl, first_col + col_py, "NO DATE",
+                              cell_format)
                 else:
-                    max_len = max(max(len_lst), 16)
-                sht.set_column(col + ":" + col, max_len)
-            elif custom_width:
-                custom_dict = {x: y for x, y in custom_width}
+                    sht.write_datetime(row_xl, first_col + col_py, value,
+                                       cell_format)
+        return
+
+    def column_formats(self, first_col, width, date_idx, col_formats):
+        """
+        Resolves per-column format specs into cached Format objects.
+        Each spec is layered over the column's default (generic or
+        date) format.
+        :param first_col: 0-based sheet column of the first column
+        :param width: Number of columns
+        :param date_idx: Pythonic indexes of the date columns
+        :param col_formats: Dictionary mapping columns (in Excel
+        format) to dictionaries of xlsxwriter format properties
+        :return: List of Format objects (None where no spec is given)
+        """
+        formats = list()
+        for col_py in range(width):
+            spec = (col_formats or {}).get(
+                XlArray.convert_to_alpha[first_col + col_py + 1])
+            if not spec:
+                formats.append(None)
+                continue
+            base = XlCreate.DATE_FORMAT if col_py in date_idx \
+                else XlCreate.WRAP_FORMAT
+            formats.append(self.formats.get({**base, **spec}))
+        return formats
+
+    def set_widths(self, sht, first_col, max_lens, custom_width=None):
+        """
+        Sets each column's width from the longest value written to it
+        (see fit_width) unless a custom width is given.
+        :param sht: xlsxwriter worksheet
+        :param first_col: 0-based sheet column of max_lens[0]
+        :param max_lens: Longest value length in each column
+        :param custom_width: Pairs (column, width) that determine
+        column-specific width
+        """
+        custom_dict = {x: y for x, y in custom_width or ()}
+        for col_py, max_len in enumerate(max_lens):
+            col = XlArray.convert_to_alpha[first_col + col_py + 1]
+            if col in custom_dict:
                 sht.set_column(col + ":" + col, custom_dict[col])
             else:
-                pass
-
+                sht.set_column(col + ":" + col, fit_width(max_len))
         return
+
+    def write_stream(self, sheet_name, rows, row=1, column="A",
+                     date_col=None, custom_width=None, width_sample=None,
+                     col_formats=None):
+        """
+        Writes an iterable of rows (e.g., a generator) to a new sheet
+        one row at a time without holding the full array in memory.
+        Column widths are computed as the rows are written. Pair with
+        XlCreate(..., constant_memory=True) for very large sheets.
+        Since the final row count is unknown until the iterable is
+        exhausted, an autofilter is applied instead of an Excel table.
+        :param sheet_name: Name to be used for the new sheet
+        :param rows: Iterable of rows (as sequences), header first
+        :param row: New sheet's row location of the upper-left
+        cell in the array (in Excel format, e.g., "2")
+        :param column: New sheet's column location of the
+        upper-left cell in the array (in Excel format, e.g., "B")
+        :param date_col: Columns (in Excel format) that are to be
+        written as dates
+        :param custom_width: Pairs (column, width) that determine
+        column-specific width
+        :param width_sample: If given, column widths are fitted to
+        the first width_sample rows only
+        :param col_formats: Dictionary mapping columns (in Excel
+        format) to dictionaries of xlsxwriter format properties
+        :return: Number of rows written (including the header)
+        """
+        sht = self.wb.add_worksheet(sheet_name)
+        first_row = row - 1                                                 # sht.write() uses 0-base indexes
+        first_col = XlArray.convert_to_num[column] - 1
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is None:
+            return 0
+        header = list(header)
+        for col_py, item in enumerate(header):
+            sht.write(first_row, first_col + col_py, item, self.header_bold)
+
+        # Classify the columns once as Pythonic offsets
+        date_idx = [XlArray.convert_to_num[col] - first_col - 1
+                    for col in date_col or ()]
+        runs = column_runs(len(header), date_idx,
+                           self.column_formats(first_col, len(header),
+                                               date_idx, col_formats))
+        max_lens = [0] * len(header)
+
+        row_xl = first_row
+        for record in rows:
+            row_xl += 1
+            self.write_record(sht, row_xl, first_col, record, runs,
+                              max_lens if not width_sample or
+                              row_xl - first_row <= width_sample else None)
+
+        # Adjust the column widths and filter the header
+        self.set_widths(sht, first_col, max_lens, custom_width)
+        sht.autofilter(first_row, first_col, row_xl,
+                       first_col + len(header) - 1)
+        return row_xl - first_row + 1
+
+
+def sheet_title(file):
+    """
+    :param file: File name (e.g., "Q1 report.csv")
+    :return: Valid Excel sheet name derived from the file name
+    """
+    title = re.sub(r"[\[\]:*?/\\]", "_", os.path.splitext(file)[0])
+    return title[:31] or "Sheet"
+
+
+def csv_to_xlsx(source, filename, dir_path, header=None, types=None,
+                date_format="%m/%d/%Y", custom_width=None,
+                constant_memory=True):
+    """
+    Streams a CSV file (or every CSV file in a directory, one sheet
+    per file in alphabetical order) straight into a new workbook.
+    Rows are parsed, typed, written, and measured for column widths
+    in a single pass without materializing any table. Empty files
+    are skipped.
+    :param source: Path of a CSV file or of a directory of CSV files
+    :param filename: Name of the new workbook (without extension)
+    :param dir_path: Directory where the workbook will be saved
+    :param header: Sequence containing all columns from each CSV to
+    be included. If None, each CSV's first line will be used.
+    :param types: Dictionary mapping column names to declared types
+    (see csv_parser); "date" columns are written as Excel dates
+    :param date_format: strptime format used for "date" columns
+    :param custom_width: Pairs (column, width) that determine
+    column-specific width
+    :param constant_memory: Passed to XlCreate
+    :return: Path of the new workbook
+    """
+    source = os.path.abspath(source)
+    if os.path.isdir(source):
+        directory = source
+        files = sorted(item for item in os.listdir(source)
+                       if item.lower().endswith(".csv"))
+    else:
+        directory, file = os.path.split(source)
+        files = [file]
+    types = types or dict()
+
+    with XlCreate(filename, dir_path, constant_memory) as workbook:
+        for file in files:
+            rows = csv_rows(file, directory, header, types, date_format)
+            columns = next(rows)
+            if not columns:                                                 # empty file: no header to write
+                continue
+            date_col = [XlArray.convert_to_alpha[col_py + 1]
+                        for col_py, column in enumerate(columns)
+                        if types.get(column) == "date"]
+            workbook.write_stream(sheet_title(file),
+                                  itertools.chain([columns], rows),
+                                  date_col=date_col,
+                                  custom_width=custom_width)
+    return os.path.join(dir_path, filename + ".xlsx")
+
+
+def csv_table(file, directory, header=None, types=None,
+              date_format="%m/%d/%Y"):
+    """
+    :return: Full list of rows produced by csv_rows (same parameters)
+    """
+    return list(csv_rows(file, directory, header, types, date_format))
+
+
+def csv_load_many(files, directory, filename, dir_path, header=None,
+                  types=None, date_format="%m/%d/%Y", max_workers=None,
+                  processes=True):
+    """
+    Parses many CSV files concurrently and writes each to its own
+    sheet of one workbook, in the order given. Parsing runs in a
+    process (or thread) pool while the calling thread is the single
+    writer feeding XlCreate.write; at most two files per worker are
+    parsed ahead of the writer to keep memory bounded. Empty files
+    are skipped; files with only a header get a header-only sheet.
+    :param files: Sequence of CSV file names
+    :param directory: Name of the directory containing the CSV files
+    :param filename: Name of the new workbook (without extension)
+    :param dir_path: Directory where the workbook will be saved
+    :param header: Sequence containing all columns from each CSV to
+    be included. If None, each CSV's first line will be used.
+    :param types: Dictionary mapping column names to declared types
+    (see csv_parser); "date" columns are written as Excel dates.
+    Callables must be picklable if processes is True.
+    :param date_format: strptime format used for "date" columns
+    :param max_workers: Number of parsing workers (defaults to the
+    number of CPUs)
+    :param processes: If True, parse in processes (CSV parsing is
+    CPU-bound); otherwise, in threads
+    :return: Path of the new workbook
+    """
+    directory = os.path.abspath(directory)
+    types = types or dict()
+    max_workers = max_workers or os.cpu_count() or 1
+    pool = (concurrent.futures.ProcessPoolExecutor if processes
+            else concurrent.futures.ThreadPoolExecutor)
+    files = iter(files)
+    pending = collections.deque()
+    with pool(max_workers) as executor, \
+            XlCreate(filename, dir_path) as workbook:
+        while True:
+            for file in itertools.islice(files,
+                                         2 * max_workers - len(pending)):
+                pending.append((file, executor.submit(
+                    csv_table, file, directory, header, types, date_format)))
+            if not pending:
+                break
+            file, future = pending.popleft()                                # preserve the sheet order
+            sheet_data = future.result()
+            if not sheet_data[0]:                                           # empty file: no header to write
+                continue
+            date_col = [XlArray.convert_to_alpha[col_py + 1]
+                        for col_py, column in enumerate(sheet_data[0])
+                        if types.get(column) == "date"]
+            workbook.write(sheet_title(file), sheet_data, date_col=date_col)
+    return os.path.join(dir_path, filename + ".xlsx")
+
+
+def main(argv=None):
+    """
+    Command-line entry point for csv_to_xlsx, e.g.:
+        python xl_data_tools.py extracts/ -o report -t amount=number
+    :param argv: Sequence of command-line arguments (defaults to
+    sys.argv[1:])
+    """
+    parser = argparse.ArgumentParser(
+        description="Convert a CSV file (or a directory of CSV files) "
+                    "into a formatted Excel workbook.")
+    parser.add_argument("source", help="CSV file or directory of CSVs")
+    parser.add_argument("-o", "--output", help="workbook name without "
+                        "extension (defaults to the source's name)")
+    parser.add_argument("-d", "--dir", default=".",
+                        help="directory for the new workbook")
+    parser.add_argument("-t", "--type", action="append", default=[],
+                        metavar="COLUMN=TYPE",
+                        help="declare a column type (str, int, float, "
+                             "number, date); may be repeated")
+    parser.add_argument("--date-format", default="%m/%d/%Y",
+                        help="strptime format of date columns")
+    args = parser.parse_args(argv)
+
+    types = dict()
+    for declaration in args.type:
+        column, _, kind = declaration.rpartition("=")
+        if not column:
+            parser.error(f"Column type '{declaration}' is not COLUMN=TYPE")
+        types[column] = kind
+    output = args.output or os.path.splitext(
+        os.path.basename(os.path.normpath(args.source)))[0]
+    path = csv_to_xlsx(args.source, output, os.path.abspath(args.dir),
+                       types=types, date_format=args.date_format)
+    print(path)
+    return
+
+
+if __name__ == "__main__":
+    main()